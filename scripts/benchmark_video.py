@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+ppt_to_video 基准测试
+
+启动本地模拟 TTS 服务（Fish Speech / 火山引擎接口，可模拟延迟、限流与音频大小），
+生成不同页数的演示文稿，通过 PPTToVideoConverter 完整转换，并报告：
+  - 各阶段耗时（提取、配音、截图、合成）
+  - 截图速度（张/秒）
+  - 编码速度（视频秒数 / 合成耗时，即实时倍数）
+  - 端到端吞吐（视频秒数 / 墙钟秒数）
+  - 启动耗时（python -X importtime 导入耗时、--list-services 命令耗时），可设预算
+
+结果可保存为基线，之后的运行与基线对比，超过容差视为性能回退（退出码 1）。
+仓库不附带基线数据：基线与机器相关，请在目标机器上先运行 --save-baseline 生成。
+
+用法:
+  python3 benchmark_video.py
+  python3 benchmark_video.py --slides 5,20,50 --providers fish,volcengine,local
+  python3 benchmark_video.py --latency 300 --mock-rate 5 --save-baseline baseline.json
+  python3 benchmark_video.py --baseline baseline.json --tolerance 0.2
+  python3 benchmark_video.py --startup-only --startup-budget-ms 150
+
+依赖:
+  ffmpeg、playwright（与 ppt_to_video.py 相同）
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from ppt_to_video import (  # noqa: E402
+    PPTToVideoConverter,
+    TTSScheduler,
+    estimate_speech_ms,
+    log_error,
+    log_info,
+    log_step,
+    log_success,
+    log_warning,
+)
+
+# 与基线对比的指标：True 表示越大越好
+COMPARED_METRICS = {
+    'video_seconds_per_wall_second': True,
+    'frames_per_second': True,
+    'encode_x_realtime': True,
+    'wall_seconds': False,
+    'import_ms': False,
+    'list_services_ms': False,
+}
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# 生成演示文稿使用的讲解文字素材
+NARRATION_SENTENCES = [
+    "本页介绍项目的整体背景与目标。",
+    "我们首先回顾过去一年的关键数据。",
+    "可以看到，用户规模保持稳定增长。",
+    "接下来分析主要的技术挑战。",
+    "性能优化是本季度的重点工作之一。",
+    "这里展示了新旧方案的对比结果。",
+    "最后总结经验，并规划下一步工作。",
+]
+
+
+# ---------------------------------------------------------------------------
+# 模拟 TTS 服务
+# ---------------------------------------------------------------------------
+
+class MockTTSServer:
+    """
+    模拟 TTS HTTP 服务
+
+    - POST /v1/audio/speech: Fish Speech 接口，直接返回 MP3
+    - POST /api/v1/tts: 火山引擎接口，返回 base64 音频与 addition.duration
+    音频时长按字数估算，MP3 由 ffmpeg 生成并按时长缓存；超过 rate 次/秒的请求返回 429。
+    """
+
+    def __init__(self, latency_ms: int = 200, jitter_ms: int = 100, rate: Optional[float] = None,
+                 bitrate: str = "64k", seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate = rate
+        self.bitrate = bitrate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.audio_cache: Dict[int, bytes] = {}
+        self.window_start = 0.0
+        self.window_count = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'bytes': 0}
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-tts", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def audio(self, duration_ms: int) -> bytes:
+        """指定时长的 MP3（按 100ms 取整后缓存）"""
+        duration_ms = max(100, round(duration_ms / 100) * 100)
+        with self.lock:
+            cached = self.audio_cache.get(duration_ms)
+        if cached is not None:
+            return cached
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"sine=frequency=441:duration={duration_ms / 1000}",
+            "-c:a", "libmp3lame", "-b:a", self.bitrate,
+            "-f", "mp3", "pipe:1",
+        ]
+        data = subprocess.run(cmd, capture_output=True, check=True).stdout
+        with self.lock:
+            self.audio_cache[duration_ms] = data
+        return data
+
+    def admit(self) -> bool:
+        """固定一秒窗口的限流判断"""
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.rate is None:
+                return True
+            now = time.monotonic()
+            if now - self.window_start >= 1.0:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            if self.window_count > self.rate:
+                self.stats['throttled'] += 1
+                return False
+            return True
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.stats['bytes'] += len(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+
+                if not server.admit():
+                    self._send(429, b'{"error": "rate limited"}', "application/json", {"Retry-After": "1"})
+                    return
+                server.delay()
+
+                if self.path == "/v1/audio/speech":
+                    text = payload.get("input", "")
+                    self._send(200, server.audio(estimate_speech_ms(text)), "audio/mpeg")
+                elif self.path == "/api/v1/tts":
+                    text = payload.get("request", {}).get("text", "")
+                    duration_ms = estimate_speech_ms(text)
+                    body = json.dumps({
+                        "code": 3000,
+                        "message": "Success",
+                        "data": base64.b64encode(server.audio(duration_ms)).decode(),
+                        "addition": {"duration": str(max(100, round(duration_ms / 100) * 100))},
+                    }).encode()
+                    self._send(200, body, "application/json")
+                else:
+                    self._send(404, b'{"error": "not found"}', "application/json")
+
+        return Handler
+
+
+# ---------------------------------------------------------------------------
+# 演示文稿生成与转换
+# ---------------------------------------------------------------------------
+
+def generate_deck(path: Path, slide_count: int, seed: int = 0):
+    """生成带 data-narration 的测试演示文稿（内容由 seed 决定）"""
+    rng = random.Random(seed + slide_count)
+    slides = []
+    for i in range(slide_count):
+        narration = "".join(rng.sample(NARRATION_SENTENCES, rng.randint(2, 4)))
+        hue = (i * 37) % 360
+        slides.append(f"""
+    <div class="slide{' slide-active' if i == 0 else ''}" data-narration="{narration}"
+         style="background: hsl({hue}, 45%, 92%);">
+      <h1 class="slide-title">第 {i + 1} 页：基准测试</h1>
+      <p class="slide-text">{narration}</p>
+    </div>""")
+    path.write_text(f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+  <meta charset="UTF-8">
+  <style>
+    body {{ margin: 0; font-family: sans-serif; }}
+    .slide {{ display: none; width: 100vw; height: 100vh; flex-direction: column;
+              justify-content: center; align-items: center; }}
+    .slide.slide-active {{ display: flex; }}
+    .slide-title {{ font-size: 64px; color: #222; }}
+    .slide-text {{ font-size: 32px; color: #444; max-width: 70%; }}
+  </style>
+</head>
+<body>{''.join(slides)}
+</body>
+</html>
+""", encoding='utf-8')
+
+
+def run_case(provider: str, slide_count: int, args, work_root: Path) -> Dict[str, Any]:
+    """转换一个测试演示文稿，返回该用例的指标"""
+    case_dir = work_root / f"{provider}-{slide_count}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+    html_path = case_dir / "deck.html"
+    generate_deck(html_path, slide_count, args.seed)
+
+    converter = PPTToVideoConverter(
+        html_path=str(html_path),
+        output=str(case_dir / "output.mp4"),
+        resolution=args.resolution,
+        tts_provider=provider,
+        compose_mode=args.compose,
+        pipeline=args.pipeline,
+        encoding_profile=args.profile,
+        scheduler=TTSScheduler(),
+    )
+    try:
+        converter.convert()
+    except Exception:
+        converter.cleanup()
+        raise
+    report = converter.metrics_report()
+
+    stages = report['stages']
+    frames = sum(len(frames) for frames in converter.slide_frames)
+    # 截图吞吐按墙钟计算：多个分片并行时各页耗时之和会随分片数增长
+    # 流水线模式没有独立的截图阶段，使用第一页开始截图到最后一页截图完成的跨度
+    if args.pipeline:
+        capture_seconds = report['slide_spans'].get('capture', 0.0)
+    else:
+        capture_seconds = stages.get('capture', 0.0)
+    encode_seconds = stages.get('compose') or report['slide_spans'].get('encode', 0.0)
+    video_seconds = report['video_seconds']
+
+    return {
+        'provider': provider,
+        'slides': slide_count,
+        'wall_seconds': report['wall_seconds'],
+        'stages': stages,
+        'frames': frames,
+        'frames_per_second': frames / capture_seconds if capture_seconds > 0 else 0.0,
+        'video_seconds': video_seconds,
+        'encode_x_realtime': video_seconds / encode_seconds if encode_seconds > 0 else 0.0,
+        'video_seconds_per_wall_second': report['video_seconds_per_wall_second'],
+        'subprocess_count': report['subprocess_count'],
+        'output_bytes': report['output_bytes'],
+        'tts': report['tts'],
+    }
+
+
+# ---------------------------------------------------------------------------
+# 启动耗时
+# ---------------------------------------------------------------------------
+
+def measure_startup(runs: int = 5) -> Dict[str, Any]:
+    """
+    测量 ppt_to_video 的启动耗时（取中位数）
+
+    - import_ms: python -X importtime 报告的模块累计导入耗时
+    - list_services_ms: 执行 --list-services 的墙钟耗时（含解释器启动）
+    """
+    import_times = []
+    command_times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import ppt_to_video"],
+            capture_output=True, text=True, cwd=SCRIPT_DIR
+        )
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ppt_to_video$", line)
+            if match:
+                import_times.append(int(match.group(1)) / 1000)
+
+        started = time.perf_counter()
+        subprocess.run([sys.executable, str(SCRIPT_DIR / "ppt_to_video.py"), "--list-services"],
+                       capture_output=True)
+        command_times.append((time.perf_counter() - started) * 1000)
+
+    # 导入了哪些重量级依赖（应为空：SDK 与 Playwright 均按需导入）
+    probe = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, ppt_to_video; "
+         "print(','.join(m for m in ('playwright', 'edge_tts', 'openai', 'zhipuai', 'mutagen', 'requests', 'httpx') "
+         "if m in sys.modules))"],
+        capture_output=True, text=True, cwd=SCRIPT_DIR
+    )
+    return {
+        'import_ms': statistics.median(import_times) if import_times else None,
+        'list_services_ms': statistics.median(command_times),
+        'eager_imports': [name for name in probe.stdout.strip().split(",") if name],
+    }
+
+
+# ---------------------------------------------------------------------------
+# 基线
+# ---------------------------------------------------------------------------
+
+def environment_info() -> Dict[str, Any]:
+    """基线对应的运行环境（不同机器之间的基线不可比）"""
+    ffmpeg_version = ""
+    if shutil.which("ffmpeg"):
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        ffmpeg_version = result.stdout.splitlines()[0] if result.stdout else ""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version,
+    }
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any],
+                          tolerance: float) -> List[str]:
+    """与基线对比，返回回退项描述"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get('results', {}).get(key)
+        if base is None:
+            log_warning(f"基线中没有用例 {key}，跳过对比")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            marker = "回退" if regressed else "正常"
+            print(f"  [{marker}] {key} {metric}: {old:.3f} → {new:.3f} ({change:+.1%})")
+            if regressed:
+                regressions.append(f"{key} {metric} {change:+.1%}")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print()
+    startup = results.get('startup')
+    if startup:
+        import_ms = f"{startup['import_ms']:.1f}ms" if startup['import_ms'] is not None else "未知"
+        print(f"启动耗时: 导入 {import_ms}，--list-services {startup['list_services_ms']:.1f}ms，"
+              f"启动时导入的依赖: {', '.join(startup['eager_imports']) or '无'}")
+    cases = {key: result for key, result in results.items() if key != 'startup'}
+    if not cases:
+        return
+    print(f"{'用例':<18}{'墙钟(s)':>9}{'视频(s)':>9}{'截图/s':>9}{'编码倍速':>9}{'吞吐':>8}{'子进程':>8}")
+    for key, result in cases.items():
+        print(f"{key:<18}{result['wall_seconds']:>9.1f}{result['video_seconds']:>9.1f}"
+              f"{result['frames_per_second']:>9.2f}{result['encode_x_realtime']:>9.1f}"
+              f"{result['video_seconds_per_wall_second']:>8.2f}{result['subprocess_count']:>8}")
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in result['stages'].items())
+        print(f"  阶段: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ppt_to_video 基准测试（本地模拟 TTS 服务）")
+    parser.add_argument("--slides", default="5,20", help="测试演示文稿页数，逗号分隔")
+    parser.add_argument("--providers", default="fish,volcengine",
+                        help="TTS 服务商，逗号分隔：fish / volcengine（模拟服务）/ local（本地离线）")
+    parser.add_argument("--latency", type=int, default=200, help="模拟 TTS 平均延迟（毫秒）")
+    parser.add_argument("--jitter", type=int, default=100, help="模拟 TTS 延迟抖动（毫秒）")
+    parser.add_argument("--mock-rate", type=float, default=None, help="模拟服务每秒请求上限，超出返回 429")
+    parser.add_argument("--audio-bitrate", default="64k", help="模拟音频的 MP3 码率（决定响应大小）")
+    parser.add_argument("--resolution", default="1280x720", help="视频分辨率")
+    parser.add_argument("--compose", choices=PPTToVideoConverter.COMPOSE_MODES, default="segments",
+                        help="合成模式")
+    parser.add_argument("--pipeline", action="store_true", help="使用流水线模式")
+    parser.add_argument("--profile", choices=list(PPTToVideoConverter.ENCODING_PROFILES), default="fast-draft",
+                        help="编码配置")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子（演示文稿内容与延迟抖动）")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    parser.add_argument("--save-baseline", help="将本次结果保存为基线")
+    parser.add_argument("--baseline", help="与基线对比，超过容差时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线对比的容差（比例）")
+    parser.add_argument("--keep", action="store_true", help="保留生成的演示文稿与视频")
+    parser.add_argument("--startup-only", action="store_true", help="只测量启动耗时（不需要 ffmpeg 与浏览器）")
+    parser.add_argument("--startup-budget-ms", type=float, default=None,
+                        help="导入耗时预算（毫秒），超出或启动时导入了 SDK 时退出码为 1")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, Any]] = {'startup': measure_startup()}
+    if not args.startup_only:
+        results.update(run_cases(args))
+    finish(results, args)
+
+
+def run_cases(args) -> Dict[str, Dict[str, Any]]:
+    """启动模拟服务并执行全部转换用例"""
+    if not shutil.which("ffmpeg"):
+        log_error("ffmpeg 未安装")
+        sys.exit(1)
+
+    slide_counts = [int(value) for value in args.slides.split(",") if value]
+    providers = [value for value in args.providers.split(",") if value]
+
+    server = MockTTSServer(args.latency, args.jitter, args.mock_rate, args.audio_bitrate, args.seed).start()
+    os.environ['FISH_SPEECH_URL'] = f"{server.url}/v1/audio/speech"
+    os.environ['VOLCENGINE_TTS_URL'] = f"{server.url}/api/v1/tts"
+    for name in ('VOLCENGINE_ACCESS_KEY', 'VOLCENGINE_SECRET_KEY', 'VOLCENGINE_APP_ID'):
+        os.environ.setdefault(name, 'benchmark')
+    os.environ.setdefault('LOCAL_TTS_ENGINE', 'tone')
+    log_info(f"模拟 TTS 服务: {server.url}（延迟 {args.latency}±{args.jitter}ms，"
+             f"限流 {args.mock_rate or '无'} 次/秒）")
+
+    work_root = Path(tempfile.mkdtemp(prefix="ppt_video_bench_"))
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for provider in providers:
+            for slide_count in slide_counts:
+                key = f"{provider}-{slide_count}"
+                log_step("基准", f"{key}")
+                results[key] = run_case(provider, slide_count, args, work_root)
+    finally:
+        server.stop()
+        if args.keep:
+            log_info(f"测试文件已保留: {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    log_info(f"模拟服务: 请求 {server.stats['requests']} 次，限流 {server.stats['throttled']} 次，"
+             f"返回 {server.stats['bytes'] / 1024 / 1024:.1f} MB")
+    return results
+
+
+def finish(results: Dict[str, Dict[str, Any]], args):
+    """输出结果、保存基线、与基线及启动预算对比"""
+    print_results(results)
+    failures = []
+    startup = results['startup']
+    if startup['eager_imports']:
+        failures.append(f"启动时导入了 {', '.join(startup['eager_imports'])}")
+    if args.startup_budget_ms is not None and startup['import_ms'] is not None \
+            and startup['import_ms'] > args.startup_budget_ms:
+        failures.append(f"导入耗时 {startup['import_ms']:.1f}ms 超出预算 {args.startup_budget_ms:.0f}ms")
+
+    document = {
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'environment': environment_info(),
+        'settings': {key: value for key, value in vars(args).items()
+                     if key not in ('output', 'save_baseline', 'baseline', 'keep')},
+        'results': results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding='utf-8')
+        log_info(f"结果已写入: {args.output}")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding='utf-8')
+        log_success(f"基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if baseline.get('environment') != document['environment']:
+            log_warning("基线来自不同的运行环境，对比结果仅供参考")
+        print()
+        log_info(f"与基线对比（容差 {args.tolerance:.0%}）:")
+        failures.extend(compare_with_baseline(results, baseline, args.tolerance))
+
+    if failures:
+        log_error(f"性能回退: {'; '.join(failures)}")
+        sys.exit(1)
+    log_success("未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
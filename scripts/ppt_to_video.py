@@ -1,8 +1,34 @@
 #!/usr/bin/env python3
 """
-PPT to Video Converter v3.3
+PPT to Video Converter v3.4
 将 HTML PPT 幻灯片转换为带配音和字幕的视频
 
+v3.4 改进:
+- 分段编码：每页（截图 + 配音）独立编码为片段，多进程并行，最终流复制拼接
+- 增量重建：持久工作目录 + manifest，仅重新生成输入变化的页面
+- 单次合成：图片序列与配音列表由一次 ffmpeg 直接输出 MP4，无中间文件
+- 时长登记表：每段音频只探测一次（批量探测），每种时长只生成一段静音
+- 流水线模式：截图与 TTS 并行，某页音频与截图就绪后立即编码该页片段
+- 分片截图：多个浏览器上下文并行截取不相交的页码区间
+- 事件驱动截图：基于 img.decode()、document.fonts.ready 与双 rAF 判断渲染完成，取代固定等待
+- 截图质量：默认按目标分辨率截取 JPEG，仅在需要时 2 倍超采样
+- 截图去重：按内容哈希存储截图，相同画面共用一个文件，相邻相同画面合并为一条
+- 编码配置：fast-draft / web / archive，针对静态画面调优，可选 libx265 / libsvtav1
+- TTS 调度：按服务商令牌桶限速、并发上限，限流/超时按 Retry-After 或指数退避重试
+- TTS 连接复用：每个服务商一个长连接会话 / SDK 客户端，在转换器（及批量任务）生命周期内复用
+- TTS 流式写入：响应分块写入磁盘，每个请求内存占用有上限；文件完成即登记时长
+- 批量转换：多个演示文稿共享浏览器池、TTS 调度与连接、配音缓存和编码线程池
+- 断点续转：--resume 使用持久任务目录与检查点，重新运行时跳过讲解文字提取，配音、截图与分段按页复用
+- 性能统计：各阶段与每页耗时、子进程次数、写入字节、峰值内存、浏览器耗时，输出 JSON 报告
+- 本地离线 TTS：piper / espeak-ng，或内置提示音合成器（无需网络，结果确定）
+- 按需导入：Playwright 与各 TTS SDK 仅在实际使用时导入，--list-services 等命令秒开
+- HLS 输出：每页一个 TS 分片，编码完成即追加到 EVENT 播放列表，可边转换边播放
+- 磁盘预算：工作目录可放在 tmpfs（--temp-root），超出预算时提前删除已编码页面的截图，报告峰值占用
+- 入场动画：--animate 逐帧截取翻页与元素入场动画（只录动画时长），之后以静态截图保持到讲解结束
+- 截图切页：辅助脚本记录当前页，只切换离开与进入的两页，每页切换为常数开销，切页与渲染等待合并为一次调用
+- 无浏览器提取：讲解文字与片段哈希由 html.parser 解析源文件得到，可用 --slides-json 直接读取源 JSON
+- 无损拼接音轨：single-pass / two-pass 的配音生成后即解码为统一格式的 PCM WAV，流复制拼接，封装时只编码一次 AAC
+
 v3.3 改进:
 - 增加国产 TTS 服务支持：火山引擎、智谱 AI、百度、讯飞
 - 支持 30+ 中文语音选择
@@ -21,57 +47,54 @@ v3.0 核心改进:
 """
 
 import argparse
-import asyncio
+import base64
+import contextlib
 import json
+import math
 import os
+import queue
+import random
 import re
 import subprocess
 import sys
 import tempfile
 import shutil
 import hashlib
+import importlib.util
+import threading
 import time
-import requests
+import wave
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 
-# 尝试导入可选依赖
-try:
-    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-    HAS_PLAYWRIGHT = True
-except ImportError:
-    HAS_PLAYWRIGHT = False
 
-try:
-    import edge_tts
-    HAS_EDGE_TTS = True
-except ImportError:
-    HAS_EDGE_TTS = False
+# 可选依赖：启动时只检测是否安装，真正用到时才导入（SDK 与 Playwright 导入耗时较长）
+def has_module(name: str) -> bool:
+    """检测模块是否可导入（不执行导入）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
-try:
-    from openai import OpenAI
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
 
-try:
-    import mutagen
-    HAS_MUTAGEN = True
-except ImportError:
-    HAS_MUTAGEN = False
+HAS_PLAYWRIGHT = has_module("playwright")
+HAS_EDGE_TTS = has_module("edge_tts")
+HAS_OPENAI = has_module("openai")
+HAS_MUTAGEN = has_module("mutagen")
 
-# 国产 TTS SDK
 try:
-    import volcengine
-    HAS_VOLCENGINE = True
+    import resource
+    HAS_RESOURCE = True
 except ImportError:
-    HAS_VOLCENGINE = False
+    # Windows 没有 resource 模块，峰值内存不统计
+    HAS_RESOURCE = False
 
-try:
-    from zhipuai import ZhipuAI
-    HAS_ZHIPU = True
-except ImportError:
-    HAS_ZHIPU = False
+# 国产 TTS SDK
+HAS_VOLCENGINE = has_module("volcengine")
+HAS_ZHIPU = has_module("zhipuai")
 
 
 class Colors:
@@ -106,8 +129,1006 @@ def log_step(step: str, msg: str):
     print(f"{Colors.BOLD}{Colors.BLUE}[{step}]{Colors.END} {msg}")
 
 
+def concat_line(path: Path) -> str:
+    """生成 ffmpeg concat 列表中的 file 行（转义单引号）"""
+    escaped = str(path).replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+
+class PipelineMetrics:
+    """
+    转换过程统计（线程安全）
+
+    记录各阶段与每页耗时、子进程次数与耗时、写入字节数、浏览器（Playwright）耗时，
+    report() 汇总为可序列化为 JSON 的字典（--metrics-out）。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.slides: Dict[int, Dict[str, float]] = {}
+        # 每页步骤的墙钟跨度：[最早开始, 最晚结束]（并行执行时区别于各页耗时之和）
+        self.spans: Dict[str, List[float]] = {}
+        self.subprocesses: Dict[str, Dict[str, float]] = {}
+        self.bytes_written: Dict[str, int] = {}
+        self.playwright_seconds = 0.0
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """统计一个阶段的墙钟耗时（同名阶段累加）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    @contextlib.contextmanager
+    def slide(self, slide_idx: int, kind: str):
+        """统计某页某一步（tts / capture / encode）的耗时"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_slide(slide_idx, kind, time.monotonic() - started)
+
+    def record_slide(self, slide_idx: int, kind: str, seconds: float):
+        now = time.monotonic()
+        with self.lock:
+            times = self.slides.setdefault(slide_idx, {})
+            times[kind] = times.get(kind, 0.0) + seconds
+            span = self.spans.setdefault(kind, [now - seconds, now])
+            span[0] = min(span[0], now - seconds)
+            span[1] = max(span[1], now)
+
+    @contextlib.contextmanager
+    def playwright(self):
+        """统计浏览器操作耗时（多个浏览器并行时为各自耗时之和）"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.playwright_seconds += elapsed
+
+    def count_subprocess(self, program: str, seconds: float):
+        with self.lock:
+            stats = self.subprocesses.setdefault(program, {'count': 0, 'seconds': 0.0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+
+    def add_bytes(self, kind: str, size: int):
+        with self.lock:
+            self.bytes_written[kind] = self.bytes_written.get(kind, 0) + size
+
+    @staticmethod
+    def peak_rss_bytes() -> Dict[str, Optional[int]]:
+        """本进程与已结束子进程（ffmpeg 等）的峰值常驻内存"""
+        if not HAS_RESOURCE:
+            return {'self': None, 'children': None}
+        # Linux 下 ru_maxrss 单位为 KB，macOS 为字节
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return {
+            'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+        }
+
+    def report(self, **extra) -> Dict[str, Any]:
+        """汇总统计"""
+        with self.lock:
+            report = {
+                'wall_seconds': time.monotonic() - self.started,
+                'stages': dict(self.stages),
+                'slide_times': {str(idx + 1): dict(times) for idx, times in sorted(self.slides.items())},
+                'slide_spans': {kind: end - start for kind, (start, end) in self.spans.items()},
+                'subprocesses': {name: dict(stats) for name, stats in self.subprocesses.items()},
+                'subprocess_count': sum(stats['count'] for stats in self.subprocesses.values()),
+                'bytes_written': dict(self.bytes_written),
+                'playwright_seconds': self.playwright_seconds,
+            }
+        report['peak_rss_bytes'] = self.peak_rss_bytes()
+        report.update(extra)
+        return report
+
+
+def parse_size(value: str) -> int:
+    """解析容量字符串（如 500M、2G、1.5T），返回字节数"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', value.upper())
+    if not match:
+        raise ValueError(f"无法解析容量: {value}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit or ' '))
+
+
+class DiskBudget:
+    """
+    工作目录磁盘占用记账（线程安全）
+
+    记录写入与删除的字节数及峰值；设置 limit 时 exceeded() 用于触发提前清理。
+    """
+
+    def __init__(self, limit: Optional[int] = None, initial: int = 0):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.current = initial
+        self.peak = initial
+
+    def add(self, size: int):
+        with self.lock:
+            self.current += size
+            self.peak = max(self.peak, self.current)
+
+    def release(self, size: int):
+        with self.lock:
+            self.current = max(0, self.current - size)
+
+    def exceeded(self) -> bool:
+        return self.limit is not None and self.current > self.limit
+
+
+def run_command(cmd: List[str], metrics: Optional[PipelineMetrics] = None,
+                input_text: Optional[str] = None) -> subprocess.CompletedProcess:
+    """执行外部命令（捕获输出）；所有 ffmpeg 调用经由此处，便于统计次数与耗时"""
+    started = time.monotonic()
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, input=input_text)
+    finally:
+        if metrics is not None:
+            metrics.count_subprocess(Path(cmd[0]).name, time.monotonic() - started)
+
+
+# TTS 响应流式写入的分块大小（字节）
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def write_stream(output_path: Path, chunks) -> int:
+    """
+    将分块数据流式写入文件，返回写入字节数
+
+    先写入 .part 临时文件，完成后再改名，保证 output_path 出现时即为完整文件。
+    """
+    # 临时文件名带线程号：共享配音缓存时多个转换器可能同时写入同一文件
+    part_path = output_path.with_name(f"{output_path.name}.{threading.get_ident()}.part")
+    written = 0
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    written += len(chunk)
+        os.replace(part_path, output_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    return written
+
+
+def iter_base64_decoded(data: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """分块解码 base64 字符串，避免一次性生成完整的解码副本"""
+    # base64 每 4 个字符对应 3 个字节，按 4 的倍数切分可独立解码
+    step = chunk_size // 3 * 4
+    for start in range(0, len(data), step):
+        yield base64.b64decode(data[start:start + step])
+
+
+# 本地 TTS 输出格式：16 位单声道 PCM WAV（与 piper / espeak-ng 默认采样率一致）
+LOCAL_TTS_SAMPLE_RATE = 22050
+
+# 拼接音轨使用的统一格式：16 位单声道 PCM WAV，44.1kHz
+PCM_SAMPLE_RATE = 44100
+
+
+def estimate_speech_ms(text: str) -> int:
+    """按字数估算朗读时长：中文约每字 0.22 秒，其他语言约每词 0.3 秒"""
+    cjk = len(re.findall(r'[\u4e00-\u9fff]', text))
+    words = len(re.findall(r'[A-Za-z0-9]+', text))
+    return max(500, int(cjk * 220 + words * 300))
+
+
+def write_tone_wav(output_path: Path, duration_ms: int, frequency: int = 441, volume: float = 0.1) -> int:
+    """
+    内置合成器：写入指定时长的低音量正弦提示音 WAV，返回实际时长（毫秒）
+
+    441Hz 在 22050Hz 采样率下每周期恰好 50 个采样点，预先生成一个周期后重复写入，
+    输出完全确定，且内存占用与时长无关。
+    """
+    period = LOCAL_TTS_SAMPLE_RATE // frequency
+    amplitude = int(32767 * volume)
+    cycle = b"".join(
+        int(amplitude * math.sin(2 * math.pi * i / period)).to_bytes(2, 'little', signed=True)
+        for i in range(period)
+    )
+    total_frames = LOCAL_TTS_SAMPLE_RATE * duration_ms // 1000
+    block = cycle * (STREAM_CHUNK_SIZE // len(cycle))
+    block_frames = len(block) // 2
+
+    def _chunks():
+        remaining = total_frames
+        while remaining > 0:
+            count = min(remaining, block_frames)
+            yield block[:count * 2]
+            remaining -= count
+
+    part_path = output_path.with_name(f"{output_path.name}.{threading.get_ident()}.part")
+    try:
+        with wave.open(str(part_path), 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(LOCAL_TTS_SAMPLE_RATE)
+            for chunk in _chunks():
+                wav.writeframes(chunk)
+        os.replace(part_path, output_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    return total_frames * 1000 // LOCAL_TTS_SAMPLE_RATE
+
+
+def wav_duration_ms(path: Path) -> Optional[int]:
+    """读取 WAV 文件头中的时长（毫秒），无需子进程"""
+    try:
+        with wave.open(str(path), 'rb') as wav:
+            return wav.getnframes() * 1000 // wav.getframerate()
+    except (OSError, wave.Error, EOFError, ZeroDivisionError):
+        return None
+
+
+class TTSRetryableError(Exception):
+    """可重试的 TTS 错误（限流、超时、服务端错误），retry_after 为服务端建议的等待秒数"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retryable_error(error: Exception) -> Optional[TTSRetryableError]:
+    """
+    判断异常是否可重试，可重试时返回 TTSRetryableError
+
+    SDK（openai、zhipuai、edge-tts）与 requests 的异常类型各不相同，
+    这里按状态码与异常名称判断：429 / 5xx / 超时 / 连接错误可重试。
+    """
+    if isinstance(error, TTSRetryableError):
+        return error
+
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None) \
+        or getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = parse_retry_after(headers.get('retry-after') if hasattr(headers, 'get') else None)
+
+    if status == 429:
+        return TTSRetryableError(f"限流 (429): {error}", retry_after, throttled=True)
+    if isinstance(status, int) and status >= 500:
+        return TTSRetryableError(f"服务端错误 ({status}): {error}", retry_after)
+
+    name = type(error).__name__
+    if 'Timeout' in name or 'Connection' in name or isinstance(error, (TimeoutError, ConnectionError)):
+        return TTSRetryableError(f"{name}: {error}")
+    return None
+
+
+def check_response_status(response, service: str):
+    """HTTP 响应为 429 / 5xx 时抛出 TTSRetryableError"""
+    if response.status_code == 429 or response.status_code >= 500:
+        raise TTSRetryableError(
+            f"{service} 请求失败: {response.status_code}",
+            parse_retry_after(response.headers.get('Retry-After')),
+            throttled=response.status_code == 429
+        )
+
+
+class TokenBucket:
+    """令牌桶限速：rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """取一个令牌，必要时阻塞等待；返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """服务端要求等待时清空令牌，使所有请求一起让出配额"""
+        with self.lock:
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class TTSScheduler:
+    """
+    TTS 请求调度器
+
+    每个服务商一个令牌桶（限速）与一个信号量（并发上限）；可重试错误按
+    Retry-After 或带抖动的指数退避重试，并统计请求、限流与重试次数。
+    可在多个转换器之间共享（批量模式）。
+    """
+
+    # 各服务商的默认限额（保守值，可通过 --tts-rate / --tts-concurrency 覆盖）
+    DEFAULT_LIMITS = {
+        'edge': {'rate': 5.0, 'burst': 5, 'concurrency': 4},
+        'openai': {'rate': 3.0, 'burst': 5, 'concurrency': 4},
+        'volcengine': {'rate': 10.0, 'burst': 10, 'concurrency': 8},
+        'zhipu': {'rate': 3.0, 'burst': 5, 'concurrency': 4},
+        'fish': {'rate': 20.0, 'burst': 20, 'concurrency': 2},
+        'local': {'rate': 1000.0, 'burst': 1000, 'concurrency': 4},
+    }
+
+    def __init__(self, rate: Optional[float] = None, concurrency: Optional[int] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.semaphores: Dict[str, threading.Semaphore] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+
+    def _limits(self, provider: str):
+        with self.lock:
+            if provider not in self.buckets:
+                limits = self.DEFAULT_LIMITS.get(provider, {'rate': 5.0, 'burst': 5, 'concurrency': 4})
+                rate = self.rate or limits['rate']
+                concurrency = self.concurrency or limits['concurrency']
+                self.buckets[provider] = TokenBucket(rate, max(limits['burst'], int(rate)))
+                self.semaphores[provider] = threading.Semaphore(concurrency)
+                self.stats[provider] = {
+                    'requests': 0, 'succeeded': 0, 'failed': 0,
+                    'throttled': 0, 'retries': 0, 'wait_seconds': 0.0,
+                }
+            return self.buckets[provider], self.semaphores[provider], self.stats[provider]
+
+    def _count(self, stats: Dict[str, float], key: str, value: float = 1):
+        with self.lock:
+            stats[key] += value
+
+    def run(self, provider: str, request: Callable[[], bool]) -> bool:
+        """在限速与并发上限内执行请求，可重试错误自动重试"""
+        bucket, semaphore, stats = self._limits(provider)
+
+        for attempt in range(self.max_retries + 1):
+            self._count(stats, 'wait_seconds', bucket.acquire())
+            self._count(stats, 'requests')
+            try:
+                with semaphore:
+                    ok = request()
+                self._count(stats, 'succeeded' if ok else 'failed')
+                return ok
+            except TTSRetryableError as e:
+                if e.throttled:
+                    self._count(stats, 'throttled')
+                if attempt == self.max_retries:
+                    log_error(f"{provider} TTS 重试 {self.max_retries} 次后仍失败: {e}")
+                    self._count(stats, 'failed')
+                    return False
+
+                if e.retry_after is not None:
+                    delay = min(self.max_delay, e.retry_after)
+                    bucket.pause(delay)
+                else:
+                    # 全抖动指数退避
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                self._count(stats, 'retries')
+                self._count(stats, 'wait_seconds', delay)
+                log_warning(f"{provider} TTS {e}，{delay:.1f}秒后重试 ({attempt+1}/{self.max_retries})")
+                time.sleep(delay)
+        return False
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """各服务商的请求统计"""
+        with self.lock:
+            return {provider: dict(stats) for provider, stats in self.stats.items()}
+
+
+class TTSClientPool:
+    """
+    TTS 连接池：每个服务商一个长连接会话 / SDK 客户端
+
+    HTTP 服务（火山引擎、Fish Speech）共用一个 requests.Session，
+    OpenAI / 智谱 AI 各自复用一个客户端，保持 keep-alive 与 TLS 会话。
+    客户端首次使用时创建，可在多个转换器之间共享（批量模式）。
+    重试由 TTSScheduler 负责，因此关闭 SDK 自带的重试。
+    """
+
+    def __init__(self, pool_size: int = 10):
+        self.pool_size = max(1, pool_size)
+        self.lock = threading.Lock()
+        self._session = None
+        self._openai = None
+        self._zhipu: Dict[str, Any] = {}
+
+    def _httpx_client(self):
+        """带连接池上限的 httpx 客户端（openai / zhipuai SDK 使用）"""
+        import httpx
+        return httpx.Client(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+
+    @property
+    def session(self):
+        """共享的 requests.Session"""
+        with self.lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def openai(self):
+        """共享的 OpenAI 客户端"""
+        with self.lock:
+            if self._openai is None:
+                from openai import OpenAI
+                self._openai = OpenAI(max_retries=0, http_client=self._httpx_client())
+            return self._openai
+
+    def zhipu(self, api_key: str):
+        """共享的智谱 AI 客户端（按 API Key 区分）"""
+        with self.lock:
+            if api_key not in self._zhipu:
+                from zhipuai import ZhipuAI
+                self._zhipu[api_key] = ZhipuAI(api_key=api_key, max_retries=0, http_client=self._httpx_client())
+            return self._zhipu[api_key]
+
+    def close(self):
+        """关闭所有连接"""
+        with self.lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            for client in [self._openai, *self._zhipu.values()]:
+                if client is not None and hasattr(client, 'close'):
+                    client.close()
+            self._openai = None
+            self._zhipu = {}
+
+
+class DurationRegistry:
+    """
+    音频时长登记表（毫秒）
+
+    时长只获取一次，来源优先级：TTS 返回的元数据 / manifest 缓存 → 批量探测 → mutagen。
+    截图、拼接、合成阶段共用同一份数据；每种静音时长只生成一个可复用文件。
+    """
+
+    # 单次批量探测的最大文件数（避免命令行过长）
+    PROBE_BATCH_SIZE = 100
+
+    def __init__(self, store: Dict[str, int], silence_dir: Path,
+                 metrics: Optional[PipelineMetrics] = None):
+        # store 以文件名为键，直接指向 manifest['durations']，随 manifest 持久化
+        self.store = store
+        self.silence_dir = silence_dir
+        self.metrics = metrics
+
+    def record(self, path: Path, duration_ms: int):
+        """登记已知时长（如 TTS 响应中携带的时长）"""
+        self.store[path.name] = int(duration_ms)
+
+    def get(self, path: Path) -> Optional[int]:
+        """返回已登记的时长，未登记时返回 None"""
+        return self.store.get(path.name)
+
+    def forget(self, path: Path):
+        """删除登记（文件将以同名重新生成时调用，避免沿用旧文件的时长）"""
+        self.store.pop(path.name, None)
+
+    def probe(self, paths: List[Path]):
+        """
+        为未登记的文件批量探测时长
+
+        ffmpeg 接受多个 -i 输入并在 stderr 中逐个打印 Duration，
+        一次子进程即可获取整批文件的时长。
+        """
+        pending = [path for path in paths if self.get(path) is None]
+        for start in range(0, len(pending), self.PROBE_BATCH_SIZE):
+            batch = pending[start:start + self.PROBE_BATCH_SIZE]
+            cmd = ["ffmpeg", "-hide_banner"]
+            for path in batch:
+                cmd.extend(["-i", str(path)])
+            try:
+                # 未指定输出文件，ffmpeg 会以非零状态退出，但输入信息已打印
+                result = run_command(cmd, self.metrics)
+            except Exception as e:
+                log_warning(f"批量获取时长失败: {e}")
+                break
+
+            current = None
+            for line in result.stderr.splitlines():
+                match = re.match(r"Input #(\d+),", line)
+                if match:
+                    current = int(match.group(1))
+                    continue
+                match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", line)
+                if match and current is not None and current < len(batch):
+                    hours, minutes, seconds = match.groups()
+                    seconds = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    self.record(batch[current], round(seconds * 1000))
+
+    def inspect(self, path: Path) -> bool:
+        """
+        文件写入完成后立即在进程内读取时长（mutagen，无子进程）
+
+        在 TTS 线程中调用，与其他请求重叠；读取失败的文件留给之后的批量探测。
+        """
+        if self.get(path) is not None:
+            return True
+        if not HAS_MUTAGEN:
+            return False
+        try:
+            import mutagen
+            audio = mutagen.File(str(path))
+            if audio and getattr(audio.info, 'length', 0) > 0:
+                self.record(path, int(audio.info.length * 1000))
+                return True
+        except Exception:
+            pass
+        return False
+
+    def duration(self, path: Path) -> int:
+        """获取单个文件的时长，必要时探测"""
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+
+        self.probe([path])
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+
+        # Fallback: 尝试使用 mutagen
+        if HAS_MUTAGEN:
+            try:
+                import mutagen
+                audio = mutagen.File(str(path))
+                if audio and hasattr(audio.info, 'length'):
+                    self.record(path, int(audio.info.length * 1000))
+                    return self.store[path.name]
+            except Exception:
+                pass
+
+        log_warning(f"无法获取音频时长: {path.name}，使用默认5秒")
+        return 5000
+
+    def silence(self, duration_ms: int) -> Optional[Path]:
+        """
+        返回指定时长的静音文件，每种时长只生成一次
+
+        只用于拼接音轨的 concat 列表，其中配音已统一为 PCM，静音使用相同的采样率与编码。
+        """
+        path = self.silence_dir / f"silence_{duration_ms}ms.pcm.wav"
+        if path.exists() and path.stat().st_size > 0:
+            return path
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "lavfi",
+            "-i", f"anullsrc=r={PCM_SAMPLE_RATE}:cl=mono",
+            "-t", str(duration_ms / 1000),
+            "-c:a", "pcm_s16le",
+            str(path)
+        ]
+        result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"静音生成失败: {result.stderr}")
+            return None
+
+        self.record(path, duration_ms)
+        return path
+
+
+class HLSPlaylist:
+    """
+    增量写入的 HLS 播放列表（EVENT 类型）
+
+    每页一个 MPEG-TS 分片。片段可能乱序编码完成（并行 / 流水线），
+    播放列表只按页码顺序追加连续的前缀：前面各页时长已知后，
+    remux(segment, ts_path, offset_seconds) 以流复制转封装为 TS，
+    时间戳从 offset 开始，使整个播放列表的时间轴连续。
+    每次追加都整体重写播放列表（先写临时文件再替换），播放器始终读到完整文件。
+
+    EVENT 播放列表中 EXT-X-TARGETDURATION 不允许改变：全部页面时长已知后由 pin()
+    确定一次；此前完成的分片照常转封装，播放列表在 pin() 时才首次写入。
+    """
+
+    def __init__(self, path: Path, remux: Callable[[Path, Path, float], None],
+                 durations_ms: Optional[List[int]] = None):
+        self.path = path
+        self.remux = remux
+        self.lock = threading.Lock()
+        self.pending: Dict[int, tuple] = {}
+        self.entries: List[tuple] = []
+        self.offset_ms = 0
+        self.target_duration: Optional[int] = None
+        if durations_ms is not None:
+            self.pin(durations_ms)
+
+    def pin(self, durations_ms: List[int]):
+        """按全部页面时长确定 TARGETDURATION（只确定一次），并写入已完成的分片"""
+        with self.lock:
+            if self.target_duration is not None:
+                return
+            longest = max(list(durations_ms) + [1000])
+            self.target_duration = math.ceil(longest / 1000)
+            self.write()
+
+    def segment_path(self, slide_idx: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}_{slide_idx:03d}.ts")
+
+    def add(self, slide_idx: int, segment: Path, duration_ms: int):
+        """某页片段编码完成：追加所有已连续的页面"""
+        with self.lock:
+            self.pending[slide_idx] = (segment, duration_ms)
+            while len(self.entries) in self.pending:
+                idx = len(self.entries)
+                segment, duration_ms = self.pending.pop(idx)
+                ts_path = self.segment_path(idx)
+                self.remux(segment, ts_path, self.offset_ms / 1000)
+                self.entries.append((ts_path.name, duration_ms))
+                self.offset_ms += duration_ms
+            if self.target_duration is not None:
+                self.write()
+
+    def write(self, ended: bool = False):
+        """重写播放列表；ended 时追加 EXT-X-ENDLIST（调用方持有锁，且 TARGETDURATION 已确定）"""
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for name, duration_ms in self.entries:
+            lines.append(f"#EXTINF:{duration_ms / 1000:.3f},")
+            lines.append(name)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    def close(self, total: int):
+        """全部页面完成后结束播放列表"""
+        with self.lock:
+            if len(self.entries) != total:
+                raise RuntimeError(f"HLS 播放列表不完整: {len(self.entries)}/{total} 页")
+            if self.target_duration is None:
+                self.target_duration = math.ceil(max([duration for _, duration in self.entries] + [1000]) / 1000)
+            self.write(ended=True)
+
+
+class SlideHTMLParser(HTMLParser):
+    """
+    轻量解析 HTML PPT（不启动浏览器）
+
+    按标签栈匹配每个 .slide 元素的结束位置（与浏览器一样隐式闭合未闭合的元素），记录：
+    - slides: 每页的源码片段（用于片段哈希）、data-narration、全部文字与 .slide-text 内的文字
+    - head: <head> 的源码（用于页面公共部分哈希）
+    script / style 中的内容不计入文字；块级元素之间以空格分隔。
+    """
+
+    VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                     'param', 'source', 'track', 'wbr'}
+    INLINE_ELEMENTS = {'a', 'abbr', 'b', 'code', 'em', 'i', 'mark', 's', 'small', 'span', 'strong',
+                       'sub', 'sup', 'u'}
+
+    def __init__(self, source: str):
+        super().__init__(convert_charrefs=True)
+        self.source = source
+        # getpos() 返回 (行号, 列号)，换算为源码偏移
+        self.line_offsets = [0]
+        for line in source.split('\n'):
+            self.line_offsets.append(self.line_offsets[-1] + len(line) + 1)
+        self.slides: List[Dict[str, Any]] = []
+        self.head = ""
+        self._head_start: Optional[int] = None
+        self._stack: List[tuple] = []
+        self._slide: Optional[Dict[str, Any]] = None
+        self.feed(source)
+        self.close()
+        if self._slide is not None:
+            self._finish_slide(len(source))
+
+    def source_offset(self) -> int:
+        line, column = self.getpos()
+        return self.line_offsets[line - 1] + column
+
+    def _inside(self, kind: str) -> bool:
+        return any(entry_kind == kind for _, entry_kind in self._stack)
+
+    def _separate(self, tag: str):
+        if self._slide is not None and tag not in self.INLINE_ELEMENTS:
+            self._slide['text'].append(' ')
+            if self._inside('text'):
+                self._slide['slide_text'].append(' ')
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        kind = None
+        if tag in ('script', 'style'):
+            kind = 'skip'
+        elif self._slide is None and 'slide' in classes:
+            self._slide = {'start': self.source_offset(), 'narration': attrs.get('data-narration'),
+                           'text': [], 'slide_text': []}
+            kind = 'slide'
+        elif self._slide is not None and 'slide-text' in classes:
+            kind = 'text'
+        if tag == 'head' and self._head_start is None:
+            self._head_start = self.source_offset() + len(self.get_starttag_text())
+        self._separate(tag)
+        if tag not in self.VOID_ELEMENTS:
+            self._stack.append((tag, kind))
+
+    def handle_startendtag(self, tag, attrs):
+        self._separate(tag)
+
+    def handle_endtag(self, tag):
+        if tag == 'head' and self._head_start is not None and not self.head:
+            self.head = self.source[self._head_start:self.source_offset()]
+        if not any(name == tag for name, _ in self._stack):
+            return
+        self._separate(tag)
+        while self._stack:
+            name, kind = self._stack.pop()
+            if kind == 'slide':
+                # 被外层结束标签隐式闭合时，片段到该结束标签之前为止
+                end = self.source.find('>', self.source_offset()) + 1 if name == tag else self.source_offset()
+                self._finish_slide(end)
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        if self._slide is None or self._inside('skip'):
+            return
+        self._slide['text'].append(data)
+        if self._inside('text'):
+            self._slide['slide_text'].append(data)
+
+    def _finish_slide(self, end: int):
+        slide, self._slide = self._slide, None
+        self.slides.append({
+            'html': self.source[slide['start']:end],
+            'narration': slide['narration'],
+            'text': ''.join(slide['text']),
+            'slide_text': ''.join(slide['slide_text']),
+        })
+
+    def narration(self, slide_idx: int) -> str:
+        """与浏览器提取规则一致：优先 data-narration，其次 .slide-text 文字，最后全部文字（截断到 500 字）"""
+        slide = self.slides[slide_idx]
+        if slide['narration']:
+            return slide['narration']
+        content = re.sub(r'\s+', ' ', slide['slide_text']).strip()
+        if not content:
+            content = re.sub(r'\s+', ' ', slide['text']).strip()
+        return content[:500]
+
+
+# 截图辅助脚本：每个页面注入一次，渲染就绪判断基于事件而非固定等待
+#   show(index): 切换到该页；记录当前页，只改动离开与进入的两页（首次调用时隐藏全部页面）
+#   ready(index, timeoutMs): 等待该页所有图片解码完成、字体就绪，再等待两帧（确保已绘制）
+#   setSubtitle(text): 更新字幕（空文本时隐藏字幕框），等待字体与两帧
+#   enter(index) / activate(index): 按翻页引擎的顺序重放入场动画（页面入场、页内元素动画），
+#     动画全部暂停并返回结束时间（毫秒）；seek(ms) 定位到某一时刻；settle() 停在结束状态
+CAPTURE_HELPER_JS = """
+(() => {
+    const nextPaint = () => new Promise(resolve =>
+        requestAnimationFrame(() => requestAnimationFrame(resolve)));
+
+    window.__pptCapture = {
+        slides: document.querySelectorAll('.slide'),
+        current: null,
+
+        hide(slide) {
+            slide.classList.remove('slide-active');
+            slide.style.visibility = 'hidden';
+            slide.style.opacity = '0';
+            slide.style.display = 'none';
+        },
+
+        show(index) {
+            if (this.current === null) {
+                this.slides.forEach(s => this.hide(s));
+            } else if (this.current !== index && this.slides[this.current]) {
+                this.hide(this.slides[this.current]);
+            }
+            const slide = this.slides[index];
+            if (slide) {
+                slide.classList.add('slide-active');
+                slide.style.visibility = 'visible';
+                slide.style.opacity = '1';
+                slide.style.display = 'flex';
+            }
+            this.current = index;
+        },
+
+        async ready(index, timeoutMs) {
+            const slide = this.slides[index];
+            const imgs = slide ? Array.from(slide.querySelectorAll('img')) : [];
+            const loaded = Promise.all([
+                ...imgs.map(img => img.decode().catch(() => {})),
+                document.fonts.ready,
+            ]).then(() => 'ready');
+            const timeout = new Promise(resolve => setTimeout(() => resolve('timeout'), timeoutMs));
+            const status = await Promise.race([loaded, timeout]);
+            await nextPaint();
+            const pending = imgs.filter(img => !img.complete || img.naturalHeight === 0).length;
+            return { status, pending, count: imgs.length };
+        },
+
+        async setSubtitle(text) {
+            const el = document.getElementById('subtitle-text');
+            const container = document.getElementById('subtitle-container');
+            if (!el) return;
+            el.textContent = text;
+            if (container) container.style.display = text ? '' : 'none';
+            await document.fonts.ready;
+            await nextPaint();
+        },
+
+        playing: [],
+
+        animationsOf(slide) {
+            return document.getAnimations().filter(a => {
+                const target = a.effect && a.effect.target;
+                return target && slide.contains(target);
+            });
+        },
+
+        endOf(animation) {
+            // 无限循环的动画只计一轮
+            const timing = animation.effect.getComputedTiming();
+            return Number.isFinite(timing.endTime) ? timing.endTime : timing.delay + timing.duration;
+        },
+
+        hold(slide) {
+            this.playing = this.animationsOf(slide);
+            let end = 0;
+            for (const a of this.playing) {
+                a.pause();
+                a.currentTime = 0;
+                end = Math.max(end, this.endOf(a));
+            }
+            return end;
+        },
+
+        enter(index) {
+            // 先回到未激活状态（取消由此产生的过渡），再触发页面入场动画
+            const slide = this.slides[index];
+            slide.classList.remove('slide-active');
+            this.animationsOf(slide).forEach(a => a.cancel());
+            slide.classList.add('slide-entering');
+            return this.hold(slide);
+        },
+
+        activate(index) {
+            // 与翻页引擎相同：入场结束后移除 slide-entering 并激活，触发页内元素动画
+            const slide = this.slides[index];
+            this.playing.forEach(a => a.cancel());
+            slide.classList.remove('slide-entering');
+            slide.classList.add('slide-active');
+            return this.hold(slide);
+        },
+
+        async seek(ms) {
+            this.playing.forEach(a => { a.currentTime = ms; });
+            await nextPaint();
+        },
+
+        async settle() {
+            this.playing.forEach(a => { a.currentTime = this.endOf(a); });
+            this.playing = [];
+            await nextPaint();
+        },
+    };
+})()
+"""
+
+
+class BrowserPool:
+    """
+    Playwright 浏览器池
+
+    Playwright 的 sync API 对象只能在创建它的线程中使用，因此每个工作线程
+    独占一个 Chromium 实例（首次使用时启动），任务以 fn(browser, *args)
+    的形式提交，在任意空闲线程上执行。
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._tasks: "queue.Queue" = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"browser-{i}", daemon=True)
+            for i in range(self.size)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self):
+        playwright = None
+        browser = None
+        try:
+            while True:
+                item = self._tasks.get()
+                if item is None:
+                    break
+                future, fn, args = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if browser is None:
+                        from playwright.sync_api import sync_playwright
+                        playwright = sync_playwright().start()
+                        browser = playwright.chromium.launch(headless=True)
+                    future.set_result(fn(browser, *args))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if browser is not None:
+                browser.close()
+            if playwright is not None:
+                playwright.stop()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """提交任务，返回 Future"""
+        future: Future = Future()
+        self._tasks.put((future, fn, args))
+        return future
+
+    def close(self):
+        """关闭所有浏览器（在各自的线程中关闭）"""
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 class PPTToVideoConverter:
-    """HTML PPT 转视频转换器 v3.3"""
+    """HTML PPT 转视频转换器 v3.4"""
 
     DEFAULT_VOICES = {
         'edge': {
@@ -134,6 +1155,11 @@ class PPTToVideoConverter:
         'fish': {
             'zh': 'default',
         },
+        # 本地离线 TTS（espeak-ng 语音名；piper 使用 PIPER_MODEL 模型）
+        'local': {
+            'zh': 'cmn',
+            'en': 'en-us',
+        },
     }
 
     # Edge TTS 中文语音列表
@@ -175,8 +1201,62 @@ class PPTToVideoConverter:
         'volcengine': {'name': '火山引擎（字节）', 'free': False, 'quality': '优秀'},
         'zhipu': {'name': '智谱 AI', 'free': False, 'quality': '优秀'},
         'fish': {'name': 'Fish Speech（开源）', 'free': True, 'quality': '良好'},
+        'local': {'name': '本地离线（piper / espeak-ng / 内置提示音）', 'free': True, 'quality': '测试用'},
     }
 
+    # 本地 TTS 引擎，auto 时按顺序选择第一个可用的（piper 需设置 PIPER_MODEL）
+    LOCAL_TTS_ENGINES = ['piper', 'espeak-ng', 'tone']
+
+    # 视频合成模式
+    COMPOSE_MODES = ['segments', 'single-pass', 'two-pass']
+
+    # 输出格式：mp4 单个文件；hls 每页一个 TS 分片 + 增量更新的 m3u8 播放列表
+    OUTPUT_FORMATS = ['mp4', 'hls']
+
+    # 截图分片的最少页数（页数太少时多开浏览器得不偿失）
+    MIN_SLIDES_PER_SHARD = 4
+
+    # 默认截图分片数上限：每个分片启动一个 Chromium（常驻内存约 200–400MB）
+    MAX_DEFAULT_CAPTURE_WORKERS = 4
+
+    # 等待单页图片解码的最长时间（毫秒）
+    RENDER_TIMEOUT_MS = 10000
+
+    # 每页入场动画最多录制的时长（毫秒），超出部分直接停在最终画面
+    MAX_MOTION_MS = 4000
+
+    # 截图质量: native 按目标分辨率截取；supersample 以 2 倍像素截取，合成时再缩放
+    CAPTURE_QUALITIES = {'native': 1, 'supersample': 2}
+    CAPTURE_FORMATS = ['jpeg', 'png']
+
+    # 编码配置：输入是静态画面序列，使用长 GOP、低帧率，x264 使用 stillimage 调优
+    #   fps: None 表示使用 --fps；vfr: 可变帧率，只在画面变化时输出帧
+    #   gop_seconds: 关键帧间隔（秒）
+    ENCODING_PROFILES = {
+        'fast-draft': {
+            'description': '快速预览：极速预设、5fps 可变帧率、30 秒 GOP',
+            'fps': 5, 'vfr': True, 'gop_seconds': 30,
+            'libx264': {'preset': 'ultrafast', 'crf': 28},
+            'libx265': {'preset': 'ultrafast', 'crf': 32},
+            'libsvtav1': {'preset': 12, 'crf': 42},
+        },
+        'web': {
+            'description': '在线发布：画质与体积平衡，10 秒 GOP（默认）',
+            'fps': None, 'vfr': False, 'gop_seconds': 10,
+            'libx264': {'preset': 'medium', 'crf': 23},
+            'libx265': {'preset': 'medium', 'crf': 28},
+            'libsvtav1': {'preset': 8, 'crf': 35},
+        },
+        'archive': {
+            'description': '归档：高画质慢速预设，10 秒 GOP',
+            'fps': None, 'vfr': False, 'gop_seconds': 10,
+            'libx264': {'preset': 'slow', 'crf': 18},
+            'libx265': {'preset': 'slow', 'crf': 22},
+            'libsvtav1': {'preset': 4, 'crf': 28},
+        },
+    }
+    VIDEO_CODECS = ['libx264', 'libx265', 'libsvtav1']
+
     def __init__(
         self,
         html_path: str,
@@ -190,9 +1270,34 @@ class PPTToVideoConverter:
         subtitle: bool = True,
         subtitle_font: str = "PingFang SC, Noto Sans SC, sans-serif",
         subtitle_fontsize: int = 28,
-        subtitle_bg_radius: int = 12
+        subtitle_bg_radius: int = 12,
+        compose_mode: str = "segments",
+        jobs: Optional[int] = None,
+        work_dir: Optional[str] = None,
+        pipeline: bool = False,
+        tts_workers: int = 4,
+        capture_workers: Optional[int] = None,
+        capture_quality: str = "native",
+        capture_format: str = "jpeg",
+        jpeg_quality: int = 90,
+        encoding_profile: str = "web",
+        video_codec: str = "libx264",
+        scheduler: Optional[TTSScheduler] = None,
+        clients: Optional[TTSClientPool] = None,
+        tts_pool_size: int = 10,
+        browsers: Optional[BrowserPool] = None,
+        encoder: Optional[ThreadPoolExecutor] = None,
+        cache_dir: Optional[str] = None,
+        resume: bool = False,
+        output_format: str = "mp4",
+        temp_root: Optional[str] = None,
+        disk_budget: Optional[int] = None,
+        animate: bool = False,
+        slides_json: Optional[str] = None
     ):
         self.html_path = Path(html_path).resolve()
+        # generate_html.py 的源 slides JSON：直接从中读取讲解文字
+        self.slides_json = Path(slides_json).resolve() if slides_json else None
         self.output = Path(output).resolve()
         self.resolution = resolution
         self.width, self.height = map(int, resolution.split('x'))
@@ -208,20 +1313,127 @@ class PPTToVideoConverter:
         self.subtitle_fontsize = subtitle_fontsize
         self.subtitle_bg_radius = subtitle_bg_radius
 
+        # 合成配置
+        self.compose_mode = compose_mode
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+
+        # TTS 调度：限速、并发上限与重试（批量模式下多个转换器共享）
+        self.scheduler = scheduler or TTSScheduler()
+
+        # TTS 连接池：外部传入时由调用方负责关闭（批量模式共享）
+        self.owns_clients = clients is None
+        self.clients = clients or TTSClientPool(tts_pool_size)
+        self.tts_workers = max(1, tts_workers)
+
+        # 批量模式共享的浏览器池与编码线程池（外部传入时由调用方负责关闭）
+        self.browsers = browsers
+        self.encoder = encoder
+
+        # 流水线模式：截图、TTS、编码并行（按页编码，因此固定使用分段合成）
+        self.pipeline = pipeline
+        # 截图分片数（每个分片一个浏览器上下文）
+        self.capture_workers = max(1, capture_workers or min(os.cpu_count() or 1, self.MAX_DEFAULT_CAPTURE_WORKERS))
+
+        # 编码配置
+        self.encoding_profile = encoding_profile
+        self.video_codec = video_codec
+        # ffmpeg 版本（首次使用时探测）
+        self._ffmpeg_version: Optional[tuple] = None
+
+        # 截图质量
+        self.capture_quality = capture_quality
+        self.capture_format = capture_format
+        self.jpeg_quality = jpeg_quality
+        # 入场动画：逐帧截取，之后以静态截图保持
+        self.animate = animate
+
+        if self.pipeline and self.compose_mode != "segments":
+            log_warning("流水线模式需要分段合成，已切换为 --compose segments")
+            self.compose_mode = "segments"
+
+        # HLS 输出：每页片段转封装为 TS 分片，编码完成即发布
+        self.output_format = output_format
+        self.hls: Optional[HLSPlaylist] = None
+        if self.output_format == "hls":
+            self.output = self.output.with_suffix('.m3u8')
+            if self.compose_mode != "segments":
+                log_warning("HLS 输出按页分段，已切换为 --compose segments")
+                self.compose_mode = "segments"
+
+        # 拼接整条音轨的合成模式：配音统一为 PCM WAV 后流复制拼接（分段模式每页直接编码 AAC）
+        self.pcm_audio = self.compose_mode != "segments"
+
         if voice:
             self.voice = voice
         else:
             self.voice = self.DEFAULT_VOICES.get(tts_provider, {}).get(language, 'zh-CN-XiaoxiaoNeural')
 
-        # 临时目录
-        self.temp_dir = Path(tempfile.mkdtemp(prefix="ppt_video_"))
+        # 断点续转需要持久任务目录：未指定 work_dir 时使用输出文件旁的 .<名称>.job
+        self.resume = resume
+        if self.resume and work_dir is None:
+            work_dir = str(self.output.parent / f".{self.output.stem}.job")
+
+        # 工作目录：指定 work_dir 时持久保留，用于增量重建；否则使用临时目录
+        self.persistent = work_dir is not None
+        if self.persistent:
+            self.temp_dir = Path(work_dir).resolve()
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            # temp_root 可指向 tmpfs（如 /dev/shm），减少截图与片段的磁盘 I/O
+            if temp_root:
+                Path(temp_root).mkdir(parents=True, exist_ok=True)
+            self.temp_dir = Path(tempfile.mkdtemp(prefix="ppt_video_", dir=temp_root))
         self.slides_dir = self.temp_dir / "slides"
         self.audio_dir = self.temp_dir / "audio"
+        self.segments_dir = self.temp_dir / "segments"
         self.slides_dir.mkdir(exist_ok=True)
         self.audio_dir.mkdir(exist_ok=True)
+        self.segments_dir.mkdir(exist_ok=True)
+
+        # 配音缓存目录：配音只取决于讲解文字与语音设置，可在多个演示文稿间共享
+        self.shared_audio = cache_dir is not None
+        if self.shared_audio:
+            self.narration_dir = Path(cache_dir).resolve()
+            self.narration_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            self.narration_dir = self.audio_dir
 
         self.slide_data: List[Dict[str, Any]] = []
         self.slide_count = 0
+        # 每页的截图列表: [{'path': Path, 'duration': ms}, ...]
+        self.slide_frames: List[List[Dict[str, Any]]] = []
+        # 本次运行使用的编码片段文件名（清理工作目录时保留）
+        self.segment_names: set = set()
+        # 每页入场动画帧（--animate）: {页码: [(Path, ms), ...]}
+        self.slide_motion: Dict[int, List[tuple]] = {}
+
+        # 增量重建：每页 HTML 片段哈希、页面公共部分哈希、每页输入键
+        self.slide_fragments: List[str] = []
+        self.deck_hash = ""
+        self.slide_keys: List[Dict[str, str]] = []
+        # 视频总时长（毫秒）与工作目录占用（字节），转换完成后可用
+        self.total_duration_ms = 0
+        self.work_dir_bytes: Optional[int] = None
+        self.manifest_path = self.temp_dir / "manifest.json"
+        self.manifest_lock = threading.Lock()
+        self.manifest = self.load_manifest()
+        self.metrics = PipelineMetrics()
+        # 流水线失败时通知截图分片停止
+        self.capture_cancel = threading.Event()
+
+        # 磁盘预算：截图按引用计数，页面编码完成后引用归零的截图在超出预算时删除
+        self.disk = DiskBudget(disk_budget, initial=self.disk_usage())
+        self.frames_lock = threading.Lock()
+        self.frame_refs: Dict[Path, int] = {}
+        self.consumed_frames: set = set()
+        self.frames_released = 0
+        if disk_budget is not None and self.compose_mode != "segments":
+            log_warning("磁盘预算仅在分段合成（--compose segments）时可提前清理截图")
+        self.durations = DurationRegistry(self.manifest['durations'], self.audio_dir, self.metrics)
+
+        # 阶段检查点（仅 --resume）
+        self.checkpoint_path = self.temp_dir / "checkpoint.json"
+        self.checkpoint = self.load_checkpoint()
 
     def check_dependencies(self) -> bool:
         """检查依赖"""
@@ -229,6 +1441,15 @@ class PPTToVideoConverter:
 
         if not shutil.which('ffmpeg'):
             errors.append("ffmpeg 未安装。请运行: brew install ffmpeg")
+        elif self.video_codec != "libx264" and self.video_codec not in self.available_video_codecs():
+            errors.append(f"当前 ffmpeg 不支持编码器 {self.video_codec}，请安装包含该编码器的 ffmpeg")
+        else:
+            version = self.ffmpeg_version()
+            if version and version < (5, 1) and self.ENCODING_PROFILES[self.encoding_profile]['vfr']:
+                log_info(f"ffmpeg {version[0]}.{version[1]} 早于 5.1，可变帧率使用 -vsync vfr")
+
+        if self.output_format == "hls" and self.video_codec != "libx264":
+            errors.append("HLS 输出使用 MPEG-TS 分片，仅支持 --video-codec libx264")
 
         if not HAS_PLAYWRIGHT:
             errors.append("playwright 未安装。请运行: pip install playwright && playwright install chromium")
@@ -251,6 +1472,15 @@ class PPTToVideoConverter:
             fish_url = os.environ.get('FISH_SPEECH_URL', 'http://localhost:8080')
             log_warning(f"Fish Speech 需要本地服务运行: {fish_url}")
 
+        if self.tts_provider == "local":
+            engine = self.local_tts_engine()
+            if engine == 'piper' and not (shutil.which('piper') and os.environ.get('PIPER_MODEL')):
+                errors.append("piper 不可用。请安装 piper 并设置 PIPER_MODEL 为模型路径")
+            elif engine == 'espeak-ng' and not shutil.which('espeak-ng'):
+                errors.append("espeak-ng 未安装。请运行: brew install espeak-ng")
+            else:
+                log_info(f"本地 TTS 引擎: {engine}")
+
         if not HAS_MUTAGEN:
             log_warning("mutagen 未安装，将使用默认时长。建议运行: pip install mutagen")
 
@@ -261,6 +1491,352 @@ class PPTToVideoConverter:
 
         return True
 
+    @staticmethod
+    def hash_inputs(*parts: Any) -> str:
+        """计算输入的稳定哈希"""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """读取工作目录中的 manifest（仅持久工作目录）"""
+        if self.persistent and self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == 1:
+                    manifest.setdefault('frames', {})
+                    manifest.setdefault('motion', {})
+                    return manifest
+            except (OSError, ValueError) as e:
+                log_warning(f"manifest 读取失败，将完整重建: {e}")
+        return {'version': 1, 'slides': [], 'durations': {}, 'frames': {}, 'motion': {}}
+
+    def save_manifest(self):
+        """
+        写入 manifest（先写临时文件再替换，避免中断时损坏）
+
+        截图线程会在每页完成后调用；先复制字典快照，避免序列化时被其他线程修改。
+        """
+        if not self.persistent:
+            return
+        with self.manifest_lock:
+            self.manifest['slides'] = self.slide_keys
+            snapshot = dict(self.manifest)
+            snapshot['durations'] = dict(self.manifest['durations'])
+            snapshot['frames'] = dict(self.manifest['frames'])
+            snapshot['motion'] = dict(self.manifest['motion'])
+            tmp_path = self.manifest_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+
+    def input_fingerprint(self) -> str:
+        """HTML 内容与全部输出相关设置的哈希；变化后检查点中的阶段全部失效"""
+        return self.hash_inputs(
+            self.html_hash(), self.file_hash(self.slides_json), self.voice_settings(), self.subtitle_settings(),
+            self.render_settings(), self.encode_settings(), self.compose_mode, str(self.output)
+        )
+
+    def html_hash(self) -> str:
+        """HTML 文件内容哈希"""
+        return self.file_hash(self.html_path)
+
+    @staticmethod
+    def file_hash(path: Optional[Path]) -> str:
+        """文件内容哈希（未指定或读取失败时为空）"""
+        if path is None:
+            return ""
+        try:
+            return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+        except OSError:
+            return ""
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """
+        读取阶段检查点（仅 --resume）
+
+        stages 只记录 extract（讲解文字与片段哈希）与 compose（视频已生成）。配音、截图与
+        分段的进度按页由 manifest 与按输入哈希命名的文件记录，续转时逐页复用，不在此重复。
+        """
+        empty = {'version': 1, 'fingerprint': "", 'stages': {}}
+        if not self.resume:
+            return empty
+        fingerprint = self.input_fingerprint()
+        if self.checkpoint_path.exists():
+            try:
+                with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+                if checkpoint.get('version') == 1 and checkpoint.get('fingerprint') == fingerprint:
+                    return checkpoint
+                log_warning("输入或设置已变化，检查点失效（未变化的页面仍会复用）")
+            except (OSError, ValueError) as e:
+                log_warning(f"检查点读取失败，将从头开始: {e}")
+        empty['fingerprint'] = fingerprint
+        return empty
+
+    def stage_done(self, stage: str) -> bool:
+        """检查点中该阶段是否已完成"""
+        return stage in self.checkpoint['stages']
+
+    def mark_stage(self, stage: str, **data):
+        """记录阶段完成（先写临时文件再替换）"""
+        if not self.resume:
+            return
+        self.checkpoint['stages'][stage] = dict(data, completed_at=time.time())
+        tmp_path = self.checkpoint_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def restore_narrations(self) -> Optional[List[str]]:
+        """从检查点恢复讲解文字与片段哈希，无需再次启动浏览器"""
+        if not self.stage_done('extract'):
+            return None
+        stage = self.checkpoint['stages']['extract']
+        self.slide_fragments = stage['fragments']
+        self.deck_hash = stage['deck_hash']
+        self.slide_count = len(stage['narrations'])
+        log_info(f"从检查点恢复讲解文字（{self.slide_count} 页）")
+        return stage['narrations']
+
+    def voice_settings(self) -> Dict[str, Any]:
+        """影响配音结果的设置"""
+        settings = {'provider': self.tts_provider, 'voice': self.voice, 'language': self.language}
+        if self.tts_provider == 'local':
+            settings['engine'] = self.local_tts_engine()
+        return settings
+
+    def subtitle_settings(self) -> Dict[str, Any]:
+        """影响字幕渲染的设置"""
+        return {
+            'subtitle': self.subtitle,
+            'font': self.subtitle_font,
+            'fontsize': self.subtitle_fontsize,
+            'radius': self.subtitle_bg_radius,
+        }
+
+    def render_settings(self) -> Dict[str, Any]:
+        """影响截图的页面公共部分、视口与截图质量设置"""
+        return {
+            'deck': self.deck_hash,
+            'width': self.width,
+            'height': self.height,
+            'quality': self.capture_quality,
+            'format': self.capture_format,
+            'jpeg_quality': self.jpeg_quality if self.capture_format == 'jpeg' else None,
+            'motion_fps': self.motion_fps() if self.animate else None,
+        }
+
+    def motion_fps(self) -> int:
+        """入场动画的截帧帧率：与编码帧率一致"""
+        return self.ENCODING_PROFILES[self.encoding_profile]['fps'] or self.fps
+
+    def frame_extension(self) -> str:
+        """截图文件扩展名"""
+        return 'jpg' if self.capture_format == 'jpeg' else 'png'
+
+    def screenshot_options(self) -> Dict[str, Any]:
+        """page.screenshot 的格式参数"""
+        if self.capture_format == 'jpeg':
+            return {'type': 'jpeg', 'quality': self.jpeg_quality}
+        return {'type': 'png'}
+
+    def encode_settings(self) -> Dict[str, Any]:
+        """影响片段编码的设置"""
+        return {
+            'fps': self.fps,
+            'width': self.width,
+            'height': self.height,
+            'profile': self.encoding_profile,
+            'codec': self.video_codec,
+        }
+
+    def compute_slide_keys(self, narrations: List[str]) -> List[Dict[str, str]]:
+        """
+        计算每页的输入哈希与派生键
+
+        - audio: 讲解文字 + 语音设置 → 决定配音是否可复用
+        - frames: HTML 片段 + 讲解文字 + 字幕设置 + 页面设置 → 决定截图是否可复用
+        - segment: frames + audio + 编码设置 → 决定编码片段是否可复用
+        """
+        voice_hash = self.hash_inputs(self.voice_settings())
+        subtitle_hash = self.hash_inputs(self.subtitle_settings())
+        render_hash = self.hash_inputs(self.render_settings())
+        encode_hash = self.hash_inputs(self.encode_settings())
+
+        keys = []
+        for i, text in enumerate(narrations):
+            fragment_hash = self.slide_fragments[i] if i < len(self.slide_fragments) else ""
+            narration_hash = self.hash_inputs(text)
+            audio_key = self.hash_inputs(narration_hash, voice_hash)
+            frames_key = self.hash_inputs(fragment_hash, narration_hash, subtitle_hash, render_hash)
+            keys.append({
+                'fragment': fragment_hash,
+                'narration': narration_hash,
+                'voice': voice_hash,
+                'subtitle': subtitle_hash,
+                'audio': audio_key,
+                'frames': frames_key,
+                'segment': self.hash_inputs(frames_key, audio_key, encode_hash),
+            })
+        return keys
+
+    def cached_frames(self, slide_idx: int, count: int) -> Optional[List[Path]]:
+        """返回可复用的截图路径；任一缺失则返回 None"""
+        if slide_idx >= len(self.slide_keys):
+            return None
+        names = self.manifest['frames'].get(self.slide_keys[slide_idx]['frames'])
+        if not names or len(names) != count:
+            return None
+        paths = [self.slides_dir / name for name in names]
+        if all(path.exists() for path in paths):
+            return paths
+        return None
+
+    def cached_motion(self, slide_idx: int) -> Optional[List[tuple]]:
+        """返回可复用的入场动画帧（无动画的页面为空列表）；未录制或文件缺失则返回 None"""
+        if slide_idx >= len(self.slide_keys):
+            return None
+        entries = self.manifest['motion'].get(self.slide_keys[slide_idx]['frames'])
+        if entries is None:
+            return None
+        motion = [(self.slides_dir / name, duration) for name, duration in entries]
+        if all(path.exists() for path, _ in motion):
+            return motion
+        return None
+
+    def store_frame(self, data: bytes) -> Path:
+        """
+        按内容哈希保存截图
+
+        画面相同的截图（如未启用字幕、重复页面）得到同一个文件，只写一次。
+        同一截图器对相同像素的编码结果一致，因此以编码后字节的哈希代替像素哈希。
+        """
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        path = self.slides_dir / f"frame_{digest}.{self.frame_extension()}"
+        # 先登记引用，再检查文件：避免刚被提前清理的同一画面被误认为已存在
+        self.retain_frames([path])
+        if not path.exists():
+            # 多个分片可能同时写入同一画面：先写临时文件再原子替换
+            tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            self.metrics.add_bytes('frames', len(data))
+            self.disk.add(len(data))
+        return path
+
+    def retain_frames(self, paths: List[Path]):
+        """登记截图被某页引用（该页编码完成前不会被清理）"""
+        with self.frames_lock:
+            for path in paths:
+                self.frame_refs[path] = self.frame_refs.get(path, 0) + 1
+                self.consumed_frames.discard(path)
+
+    def release_frames(self, slide_idx: int):
+        """
+        某页编码完成：释放其截图引用
+
+        引用归零的截图不再被任何待编码页面使用；超出磁盘预算时立即删除。
+        """
+        if slide_idx >= len(self.slide_frames):
+            return
+        with self.frames_lock:
+            for frame in self.slide_frames[slide_idx]:
+                path = frame['path']
+                count = self.frame_refs.get(path, 0) - 1
+                if count > 0:
+                    self.frame_refs[path] = count
+                else:
+                    self.frame_refs.pop(path, None)
+                    self.consumed_frames.add(path)
+
+            if not self.disk.exceeded():
+                return
+            for path in self.consumed_frames:
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except OSError:
+                    continue
+                self.disk.release(size)
+                self.frames_released += 1
+            self.consumed_frames.clear()
+
+    def segment_path_for(self, slide_idx: int, audio: Optional[Path], duration_ms: int) -> Path:
+        """
+        某页编码片段路径（按输入哈希寻址）
+
+        除输入键外还包含实际使用的截图（文件按内容命名）与时长，以及是否有配音：
+        TTS 失败时以静音编码的片段、渲染超时时截取的画面，都不会在下次运行时被当作正常片段复用。
+        """
+        if slide_idx < len(self.slide_keys):
+            frames = [(frame['path'].name, frame['duration']) for frame in self.slide_frames[slide_idx]]
+            has_audio = bool(audio and audio.exists())
+            key = self.hash_inputs(self.slide_keys[slide_idx]['segment'], has_audio, duration_ms, frames)
+            return self.segments_dir / f"segment_{key}.mp4"
+        return self.segments_dir / f"segment_{slide_idx:03d}.mp4"
+
+    def audio_path_for(self, slide_idx: int) -> Path:
+        """某页配音路径（按输入哈希寻址）"""
+        if slide_idx < len(self.slide_keys):
+            return self.narration_dir / f"narration_{self.slide_keys[slide_idx]['audio']}.{self.audio_extension()}"
+        return self.narration_dir / f"narration_{slide_idx:03d}.{self.audio_extension()}"
+
+    @staticmethod
+    def pcm_path_for(audio: Path) -> Path:
+        """配音对应的 PCM WAV 路径（与配音同目录）"""
+        return audio.with_name(f"{audio.stem}.pcm.wav")
+
+    def audio_extension(self) -> str:
+        """配音文件扩展名：本地 TTS 输出 WAV，其余服务商输出 MP3"""
+        return 'wav' if self.tts_provider == 'local' else 'mp3'
+
+    def local_tts_engine(self) -> str:
+        """本地 TTS 引擎：LOCAL_TTS_ENGINE 环境变量指定，否则自动选择"""
+        engine = os.environ.get('LOCAL_TTS_ENGINE', 'auto')
+        if engine in self.LOCAL_TTS_ENGINES:
+            return engine
+        if shutil.which('piper') and os.environ.get('PIPER_MODEL'):
+            return 'piper'
+        if shutil.which('espeak-ng'):
+            return 'espeak-ng'
+        return 'tone'
+
+    def prune_work_dir(self):
+        """删除当前 manifest 未引用的缓存文件，防止持久工作目录无限增长"""
+        if not self.persistent:
+            return
+        audio_names = {self.audio_path_for(i).name for i in range(len(self.slide_keys))}
+        audio_names |= {self.pcm_path_for(self.audio_path_for(i)).name for i in range(len(self.slide_keys))}
+        frame_keys = {key['frames'] for key in self.slide_keys}
+        segment_names = set(self.segment_names)
+
+        # 共享配音缓存由多个演示文稿引用，不在此清理
+        if not self.shared_audio:
+            for path in self.audio_dir.glob("narration_*"):
+                if path.name not in audio_names:
+                    path.unlink(missing_ok=True)
+        frames = self.manifest['frames']
+        motion = self.manifest['motion']
+        for store in (frames, motion):
+            for key in list(store):
+                if key not in frame_keys:
+                    del store[key]
+        frame_names = {name for names in frames.values() for name in names}
+        frame_names |= {name for entries in motion.values() for name, _ in entries}
+        for path in self.slides_dir.glob("frame_*"):
+            if path.name not in frame_names:
+                path.unlink(missing_ok=True)
+        for path in self.segments_dir.glob("segment_*.mp4"):
+            if path.name not in segment_names:
+                path.unlink(missing_ok=True)
+
+        # 原地过滤，DurationRegistry 与 manifest 共用同一个字典
+        durations = self.manifest['durations']
+        for name in list(durations):
+            if not (self.audio_dir / name).exists() and not (self.narration_dir / name).exists():
+                del durations[name]
+
     def split_into_sentences(self, text: str) -> List[str]:
         """
         将文本按句子分割
@@ -276,6 +1852,26 @@ class PPTToVideoConverter:
             return [text]
         return sentences
 
+    def allocate_sentence_durations(self, audio_duration: int, sentences: List[str]) -> List[int]:
+        """按句子字数比例分配时长，每句至少 1.5 秒，总和等于音频时长"""
+        total_chars = sum(len(s) for s in sentences)
+        sentence_durations = []
+        for sent in sentences:
+            if total_chars > 0:
+                sent_duration = int(audio_duration * len(sent) / total_chars)
+            else:
+                sent_duration = audio_duration // len(sentences)
+            # 确保每句至少显示 1.5 秒
+            sent_duration = max(sent_duration, 1500)
+            sentence_durations.append(sent_duration)
+
+        # 调整总时长以匹配音频时长
+        total_allocated = sum(sentence_durations)
+        if total_allocated != audio_duration and sentence_durations:
+            sentence_durations[-1] += (audio_duration - total_allocated)
+
+        return sentence_durations
+
     def capture_slides(self, audio_durations: List[int], narrations: List[str] = None) -> tuple:
         """
         使用 Playwright 逐页截图
@@ -283,6 +1879,8 @@ class PPTToVideoConverter:
         v3.0: 接收音频时长列表，每页展示时间 = 该页音频时长
         v3.1: 支持内嵌字幕渲染
         v3.2: 字幕按句子分割，逐句显示，与音频同步
+        v3.4: 输入未变化的页面复用已有截图；全部可复用时不启动浏览器
+        v3.4: --animate 时第一句之前插入入场动画帧
 
         Returns:
             tuple: (截图总数, 每张截图的时长列表, 每张截图对应的字幕列表)
@@ -292,238 +1890,373 @@ class PPTToVideoConverter:
         if narrations is None:
             narrations = []
 
+        slide_sentences, slide_paths = self.plan_capture(narrations)
+        if not narrations or any(paths is None for paths in slide_paths):
+            self._capture_pending(narrations, slide_sentences, slide_paths)
+
         # 用于存储每张截图的时长和字幕
         screenshot_durations = []
         screenshot_subtitles = []
+        self.slide_frames = []
+
+        for slide_idx, (sentences, paths) in enumerate(zip(slide_sentences, slide_paths)):
+            audio_duration = audio_durations[slide_idx] if slide_idx < len(audio_durations) else 5000
+            frames = self.timed_frames(sentences, paths or [], audio_duration, self.slide_motion.get(slide_idx))
+            self.slide_frames.append(frames)
+            screenshot_durations.extend(frame['duration'] for frame in frames)
+            screenshot_subtitles.extend(sentences)
+
+        screenshot_count = len(screenshot_durations)
+        unique_count = len({frame['path'] for frames in self.slide_frames for frame in frames})
+        log_success(f"已捕获 {screenshot_count} 张幻灯片截图（含字幕分割，去重后 {unique_count} 个文件）")
+        return screenshot_count, screenshot_durations, screenshot_subtitles
+
+    @contextlib.contextmanager
+    def browser_pool(self):
+        """提取与截图使用的浏览器池：批量模式使用共享池，否则新建并在用完后关闭"""
+        if self.browsers is not None:
+            yield self.browsers
+            return
+        pool = BrowserPool(self.capture_workers)
+        try:
+            yield pool
+        finally:
+            pool.close()
+
+    @contextlib.contextmanager
+    def encode_pool(self):
+        """片段编码线程池：批量模式使用共享线程池，否则新建"""
+        if self.encoder is not None:
+            yield self.encoder
+            return
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            yield executor
+
+    def plan_capture(self, narrations: List[str]) -> tuple:
+        """
+        规划截图：每页的字幕句子，以及可复用的截图路径
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                viewport={'width': self.width, 'height': self.height},
-                device_scale_factor=2
-            )
-            page = context.new_page()
-
-            # 加载 HTML
-            page.goto(f"file://{self.html_path}", wait_until='networkidle')
-            page.wait_for_selector('.slide', timeout=10000)
-
-            # 隐藏控制面板
-            page.evaluate("""
-                const panel = document.querySelector('.control-panel');
-                if (panel) panel.style.display = 'none';
-            """)
+        Returns:
+            tuple: (每页句子列表, 每页截图路径列表；None 表示需要重新截图)
+        """
+        slide_sentences = []
+        slide_paths: List[Optional[List[Path]]] = []
+        for slide_idx, narration in enumerate(narrations):
+            sentences = self.split_into_sentences(narration) if self.subtitle and narration else [""]
+            slide_sentences.append(sentences)
+            paths = self.cached_frames(slide_idx, len(sentences))
+            if paths and self.animate:
+                motion = self.cached_motion(slide_idx)
+                if motion is None:
+                    paths = None
+                else:
+                    self.slide_motion[slide_idx] = motion
+                    self.retain_frames([path for path, _ in motion])
+            if paths:
+                self.retain_frames(paths)
+            slide_paths.append(paths)
+
+        reused = sum(1 for paths in slide_paths if paths)
+        if reused:
+            log_info(f"复用 {reused}/{len(narrations)} 页截图（输入未变化）")
+        return slide_sentences, slide_paths
+
+    def timed_frames(self, sentences: List[str], paths: List[Path], audio_duration: int,
+                     motion: Optional[List[tuple]] = None) -> List[Dict[str, Any]]:
+        """
+        截图本身与音频无关，只有时长取决于音频：按句子为截图分配时长
+
+        有入场动画时，动画帧排在最前，占用第一句的时长，第一句的静态截图只保持剩余时间；
+        动画比第一句还长时，超出的帧时长为 0（合成时跳过，仍保留在列表中以便释放引用）。
+        """
+        sentence_durations = self.allocate_sentence_durations(audio_duration, sentences)
+        frames = []
+        if motion and sentence_durations:
+            remaining = sentence_durations[0]
+            for path, duration in motion:
+                duration = min(duration, remaining)
+                frames.append({'path': path, 'duration': duration})
+                remaining -= duration
+            sentence_durations[0] = remaining
+        frames.extend({'path': path, 'duration': duration} for path, duration in zip(paths, sentence_durations))
+        return frames
+
+    def _capture_pending(self, narrations: List[str], slide_sentences: List[List[str]],
+                         slide_paths: List[Optional[List[Path]]],
+                         on_captured: Optional[Callable[[int, List[Path]], None]] = None):
+        """
+        为 slide_paths 中为 None 的页面逐句截图（原地填充 slide_paths）
 
-            # 如果启用字幕，注入字幕容器和样式
+        v3.4: 待截图页面按连续区间分片，每个分片在浏览器池中独立的
+        浏览器上下文里加载一次页面并截取自己负责的页面，结果按页码归位。
+
+        未提供讲解文字时，按页面中的幻灯片数量逐页截图（无字幕）。
+        on_captured(slide_idx, paths) 在每页截图完成后调用（流水线模式使用）。
+        """
+        with self.browser_pool() as pool:
+            if not narrations:
+                total_slides = pool.submit(self.in_browser, self._count_slides).result()
+                slide_sentences.extend([[""]] * total_slides)
+                slide_paths.extend([None] * total_slides)
+
+            pending = [idx for idx, paths in enumerate(slide_paths) if paths is None]
+            if not pending:
+                return
+
+            shard_count = min(self.capture_workers, -(-len(pending) // self.MIN_SLIDES_PER_SHARD))
+            shard_size = -(-len(pending) // shard_count)
+            shards = [pending[start:start + shard_size] for start in range(0, len(pending), shard_size)]
+            log_info(f"截图分为 {len(shards)} 个分片并行执行（共 {len(pending)} 页）")
             if self.subtitle:
-                subtitle_css = f"""
-                    .video-subtitle-container {{
-                        position: fixed;
-                        bottom: 60px;
-                        left: 0;
-                        right: 0;
-                        display: flex;
-                        justify-content: center;
-                        align-items: flex-end;
-                        z-index: 9999;
-                        pointer-events: none;
-                        padding: 0 80px;
-                    }}
-                    .video-subtitle {{
-                        font-family: '{self.subtitle_font}';
-                        font-size: {self.subtitle_fontsize}px;
-                        font-weight: 500;
-                        color: #FFFFFF;
-                        background: rgba(0, 0, 0, 0.75);
-                        padding: 12px 24px;
-                        border-radius: {self.subtitle_bg_radius}px;
-                        line-height: 1.5;
-                        text-align: center;
-                        max-width: 85%;
-                        word-wrap: break-word;
-                        box-shadow: 0 2px 12px rgba(0, 0, 0, 0.3);
-                        display: -webkit-box;
-                        -webkit-line-clamp: 2;
-                        -webkit-box-orient: vertical;
-                        overflow: hidden;
-                    }}
-                """
-                page.evaluate(f"""
-                    (() => {{
-                        // 注入样式
-                        const style = document.createElement('style');
-                        style.id = 'subtitle-style';
-                        style.textContent = `{subtitle_css}`;
-                        document.head.appendChild(style);
-
-                        // 创建字幕容器
-                        const container = document.createElement('div');
-                        container.className = 'video-subtitle-container';
-                        container.id = 'subtitle-container';
-
-                        const subtitle = document.createElement('div');
-                        subtitle.className = 'video-subtitle';
-                        subtitle.id = 'subtitle-text';
-
-                        container.appendChild(subtitle);
-                        document.body.appendChild(container);
-                    }})()
-                """)
                 log_info("已启用内嵌字幕（单行模式）")
 
-            # 获取所有幻灯片
-            total_slides = page.evaluate("document.querySelectorAll('.slide').length")
-            log_info(f"发现 {total_slides} 张幻灯片")
+            futures = [
+                pool.submit(self.in_browser, self._capture_shard, shard, slide_sentences, slide_paths, on_captured)
+                for shard in shards
+            ]
+            for future in futures:
+                future.result()
 
-            screenshot_idx = 0
+    def in_browser(self, browser, fn: Callable, *args):
+        """在浏览器池线程中执行 fn(browser, *args)，并统计浏览器耗时"""
+        with self.metrics.playwright():
+            return fn(browser, *args)
 
-            for slide_idx in range(total_slides):
-                audio_duration = audio_durations[slide_idx] if slide_idx < len(audio_durations) else 5000
-                narration = narrations[slide_idx] if slide_idx < len(narrations) else ""
+    def _count_slides(self, browser) -> int:
+        """统计页面中的幻灯片数量"""
+        page = browser.new_page()
+        try:
+            page.goto(f"file://{self.html_path}")
+            return page.evaluate("document.querySelectorAll('.slide').length")
+        finally:
+            page.close()
+
+    def _open_capture_page(self, browser):
+        """新建浏览器上下文并加载页面：隐藏控制面板，按需注入字幕容器"""
+        context = browser.new_context(
+            viewport={'width': self.width, 'height': self.height},
+            device_scale_factor=self.CAPTURE_QUALITIES.get(self.capture_quality, 1)
+        )
+        page = context.new_page()
+
+        # 加载 HTML
+        page.goto(f"file://{self.html_path}", wait_until='networkidle')
+        page.wait_for_selector('.slide', timeout=10000)
+
+        # 隐藏控制面板
+        page.evaluate("""
+            const panel = document.querySelector('.control-panel');
+            if (panel) panel.style.display = 'none';
+        """)
+
+        # 如果启用字幕，注入字幕容器和样式
+        if self.subtitle:
+            subtitle_css = f"""
+                .video-subtitle-container {{
+                    position: fixed;
+                    bottom: 60px;
+                    left: 0;
+                    right: 0;
+                    display: flex;
+                    justify-content: center;
+                    align-items: flex-end;
+                    z-index: 9999;
+                    pointer-events: none;
+                    padding: 0 80px;
+                }}
+                .video-subtitle {{
+                    font-family: '{self.subtitle_font}';
+                    font-size: {self.subtitle_fontsize}px;
+                    font-weight: 500;
+                    color: #FFFFFF;
+                    background: rgba(0, 0, 0, 0.75);
+                    padding: 12px 24px;
+                    border-radius: {self.subtitle_bg_radius}px;
+                    line-height: 1.5;
+                    text-align: center;
+                    max-width: 85%;
+                    word-wrap: break-word;
+                    box-shadow: 0 2px 12px rgba(0, 0, 0, 0.3);
+                    display: -webkit-box;
+                    -webkit-line-clamp: 2;
+                    -webkit-box-orient: vertical;
+                    overflow: hidden;
+                }}
+            """
+            page.evaluate(f"""
+                (() => {{
+                    // 注入样式
+                    const style = document.createElement('style');
+                    style.id = 'subtitle-style';
+                    style.textContent = `{subtitle_css}`;
+                    document.head.appendChild(style);
+
+                    // 创建字幕容器
+                    const container = document.createElement('div');
+                    container.className = 'video-subtitle-container';
+                    container.id = 'subtitle-container';
+
+                    const subtitle = document.createElement('div');
+                    subtitle.className = 'video-subtitle';
+                    subtitle.id = 'subtitle-text';
+
+                    container.appendChild(subtitle);
+                    document.body.appendChild(container);
+                }})()
+            """)
 
-                # 将讲解文字按句子分割
-                sentences = self.split_into_sentences(narration) if self.subtitle and narration else [""]
+        page.evaluate(CAPTURE_HELPER_JS)
+        return context, page
 
-                # 按句子字数比例分配时间
-                total_chars = sum(len(s) for s in sentences)
-                sentence_durations = []
-                for sent in sentences:
-                    if total_chars > 0:
-                        sent_duration = int(audio_duration * len(sent) / total_chars)
-                    else:
-                        sent_duration = audio_duration // len(sentences)
-                    # 确保每句至少显示 1.5 秒
-                    sent_duration = max(sent_duration, 1500)
-                    sentence_durations.append(sent_duration)
+    def show_slide(self, page, slide_idx: int) -> bool:
+        """
+        切换到指定页并等待渲染就绪：图片解码完成、字体就绪、并已绘制
 
-                # 调整总时长以匹配音频时长
-                total_allocated = sum(sentence_durations)
-                if total_allocated != audio_duration and sentence_durations:
-                    sentence_durations[-1] += (audio_duration - total_allocated)
+        切页只改动离开与进入的两页，与等待合并为一次 evaluate。
+        耗时取决于实际渲染，而不是固定等待；超时后记录警告并继续截图。
+
+        Returns:
+            bool: 是否渲染完整（超时或有图片未加载时为 False）
+        """
+        state = page.evaluate(
+            """([index, timeoutMs]) => {
+                window.__pptCapture.show(index);
+                return window.__pptCapture.ready(index, timeoutMs);
+            }""",
+            [slide_idx, self.RENDER_TIMEOUT_MS]
+        )
+        if state.get('status') == 'timeout' or state.get('pending'):
+            log_warning(f"  第 {slide_idx+1} 页有 {state.get('pending', 0)}/{state.get('count', 0)} 张图片未能加载")
+            return False
+        return True
 
-                log_info(f"捕获第 {slide_idx+1}/{total_slides} 页 ({len(sentences)} 句字幕, 总 {audio_duration/1000:.1f}秒)...")
+    def _capture_shard(self, browser, indices: List[int], slide_sentences: List[List[str]],
+                       slide_paths: List[Optional[List[Path]]],
+                       on_captured: Optional[Callable[[int, List[Path]], None]] = None):
+        """在独立的浏览器上下文中截取一个分片（一段连续页码）"""
+        context, page = self._open_capture_page(browser)
+        total_slides = len(slide_paths)
 
-                # 显示当前幻灯片
-                page.evaluate(f"""
-                    (() => {{
-                        const slides = document.querySelectorAll('.slide');
-                        slides.forEach((s, idx) => {{
-                            s.classList.remove('slide-active');
-                            s.style.visibility = 'hidden';
-                            s.style.opacity = '0';
-                            s.style.display = 'none';
-                        }});
-                        if (slides[{slide_idx}]) {{
-                            slides[{slide_idx}].classList.add('slide-active');
-                            slides[{slide_idx}].style.visibility = 'visible';
-                            slides[{slide_idx}].style.opacity = '1';
-                            slides[{slide_idx}].style.display = 'flex';
-                        }}
-                    }})()
-                """)
+        try:
+            for slide_idx in indices:
+                if self.capture_cancel.is_set():
+                    break
+                started = time.monotonic()
+                sentences = slide_sentences[slide_idx]
+                frame_paths = []
 
-                # 等待图片加载
-                img_loaded = page.evaluate(f"""
-                    (() => {{
-                        const slide = document.querySelectorAll('.slide')[{slide_idx}];
-                        if (!slide) return {{ loaded: true, count: 0 }};
-                        const imgs = slide.querySelectorAll('img');
-                        let allLoaded = true;
-                        imgs.forEach(img => {{
-                            if (!img.complete || img.naturalHeight === 0) {{
-                                allLoaded = false;
-                            }}
-                        }});
-                        return {{ loaded: allLoaded, count: imgs.length }};
-                    }})()
-                """)
+                log_info(f"捕获第 {slide_idx+1}/{total_slides} 页 ({len(sentences)} 句字幕)...")
 
-                if not img_loaded.get('loaded', True) and img_loaded.get('count', 0) > 0:
-                    log_info(f"  等待 {img_loaded.get('count', 0)} 张图片加载...")
-                    for _ in range(20):
-                        page.wait_for_timeout(500)
-                        check = page.evaluate(f"""
-                            (() => {{
-                                const slide = document.querySelectorAll('.slide')[{slide_idx}];
-                                if (!slide) return true;
-                                const imgs = slide.querySelectorAll('img');
-                                let allLoaded = true;
-                                imgs.forEach(img => {{
-                                    if (!img.complete || img.naturalHeight === 0) {{
-                                        allLoaded = false;
-                                    }}
-                                }});
-                                return allLoaded;
-                            }})()
-                        """)
-                        if check:
-                            break
-                    page.wait_for_timeout(200)
+                # 显示当前幻灯片，等待图片解码、字体就绪并完成绘制
+                rendered = self.show_slide(page, slide_idx)
 
                 # 为每个句子截图
                 for sent_idx, sentence in enumerate(sentences):
-                    sent_duration = sentence_durations[sent_idx]
-
-                    # 更新字幕内容（单行）
-                    if self.subtitle and sentence:
-                        escaped_sentence = sentence.replace('`', '\\`').replace('\n', ' ')
-                        page.evaluate(f"""
-                            (() => {{
-                                const subtitleEl = document.getElementById('subtitle-text');
-                                if (subtitleEl) {{
-                                    subtitleEl.textContent = `{escaped_sentence}`;
-                                }}
-                            }})()
-                        """)
-
-                    # 等待字幕渲染
-                    page.wait_for_timeout(100)
+                    # 更新字幕内容（单行），等待其绘制完成
+                    if self.subtitle:
+                        page.evaluate("text => window.__pptCapture.setSubtitle(text)", sentence.replace('\n', ' '))
 
-                    # 截图
-                    screenshot_path = self.slides_dir / f"slide_{screenshot_idx:04d}.png"
-                    page.screenshot(
-                        path=str(screenshot_path),
-                        type='png',
-                        full_page=False
-                    )
+                    # 第一句字幕下录制入场动画，随后的截图即动画结束后的画面
+                    if sent_idx == 0 and self.animate:
+                        self.slide_motion[slide_idx] = self.capture_motion(page, slide_idx)
 
-                    screenshot_durations.append(sent_duration)
-                    screenshot_subtitles.append(sentence)
-                    screenshot_idx += 1
+                    # 截图
+                    data = page.screenshot(full_page=False, **self.screenshot_options())
+                    frame_paths.append(self.store_frame(data))
+
+                slide_paths[slide_idx] = frame_paths
+                self.metrics.record_slide(slide_idx, 'capture', time.monotonic() - started)
+                if slide_idx < len(self.slide_keys):
+                    frames_key = self.slide_keys[slide_idx]['frames']
+                    if rendered:
+                        self.manifest['frames'][frames_key] = [path.name for path in frame_paths]
+                        if self.animate:
+                            self.manifest['motion'][frames_key] = [
+                                [path.name, duration] for path, duration in self.slide_motion[slide_idx]
+                            ]
+                    else:
+                        # 渲染不完整的截图只用于本次输出，不登记为可复用，下次运行重新截取
+                        self.manifest['frames'].pop(frames_key, None)
+                        self.manifest['motion'].pop(frames_key, None)
+                    # 每页完成即写入 manifest，中断后可从下一页继续
+                    self.save_manifest()
+                if on_captured:
+                    on_captured(slide_idx, frame_paths)
+        finally:
+            context.close()
+
+    def capture_motion(self, page, slide_idx: int) -> List[tuple]:
+        """
+        逐帧截取当前页的入场动画（--animate）
 
-            browser.close()
+        先重放页面入场（slide-entering），再重放页内元素动画（slide-active）。动画全部暂停，
+        按帧间隔设置 currentTime 后截图：帧时间与截图耗时无关，结果确定，也不受并行分片拖慢。
+        只截取动画时长（最多 MAX_MOTION_MS），结束后停在最终画面。
 
-        log_success(f"已捕获 {screenshot_idx} 张幻灯片截图（含字幕分割）")
-        return screenshot_idx, screenshot_durations, screenshot_subtitles
+        Returns:
+            [(截图路径, 时长毫秒), ...]；没有动画的页面为空列表
+        """
+        frame_ms = 1000 / self.motion_fps()
+        starts = []
+        paths = []
+        elapsed = 0.0
+        for phase in ('enter', 'activate'):
+            end_ms = page.evaluate(f"index => window.__pptCapture.{phase}(index)", slide_idx)
+            end_ms = min(end_ms, self.MAX_MOTION_MS - elapsed)
+            offset = 0.0
+            while offset < end_ms:
+                page.evaluate("ms => window.__pptCapture.seek(ms)", offset)
+                data = page.screenshot(full_page=False, **self.screenshot_options())
+                paths.append(self.store_frame(data))
+                starts.append(elapsed + offset)
+                offset += frame_ms
+            elapsed += max(0.0, end_ms)
+        page.evaluate("() => window.__pptCapture.settle()")
+
+        # 每帧时长 = 相邻帧的起始时间之差（取整误差不累积）
+        ends = starts[1:] + [elapsed]
+        return [(path, round(end) - round(start)) for path, start, end in zip(paths, starts, ends)]
 
     def generate_audio_edge(self, text: str, output_path: Path) -> bool:
         """使用 Edge TTS 生成音频"""
         try:
+            import asyncio
+            import edge_tts
             communicate = edge_tts.Communicate(text, self.voice)
+            part_path = output_path.with_name(f"{output_path.name}.{threading.get_ident()}.part")
 
             async def _save():
-                await communicate.save(str(output_path))
+                await communicate.save(str(part_path))
 
-            asyncio.run(_save())
+            try:
+                asyncio.run(_save())
+                os.replace(part_path, output_path)
+            finally:
+                part_path.unlink(missing_ok=True)
             return True
         except Exception as e:
+            retryable = retryable_error(e)
+            if retryable:
+                raise retryable
             log_error(f"Edge TTS 生成失败: {e}")
             return False
 
     def generate_audio_openai(self, text: str, output_path: Path) -> bool:
         """使用 OpenAI TTS 生成音频"""
         try:
-            client = OpenAI()
-            response = client.audio.speech.create(
+            client = self.clients.openai()
+            with client.audio.speech.with_streaming_response.create(
                 model="tts-1",
                 voice=self.voice,
                 input=text,
                 speed=1.0
-            )
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            ) as response:
+                write_stream(output_path, response.iter_bytes(STREAM_CHUNK_SIZE))
             return True
         except Exception as e:
+            retryable = retryable_error(e)
+            if retryable:
+                raise retryable
             log_error(f"OpenAI TTS 生成失败: {e}")
             return False
 
@@ -540,7 +2273,8 @@ class PPTToVideoConverter:
                 return False
 
             # 构建请求
-            url = "https://openspeech.bytedance.com/api/v1/tts"
+            # VOLCENGINE_TTS_URL 可指向兼容服务（如基准测试的模拟服务）
+            url = os.environ.get('VOLCENGINE_TTS_URL', "https://openspeech.bytedance.com/api/v1/tts")
             headers = {
                 "Authorization": f"Bearer {access_key}",
                 "Content-Type": "application/json"
@@ -562,14 +2296,16 @@ class PPTToVideoConverter:
                 }
             }
 
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = self.clients.session.post(url, headers=headers, json=payload, timeout=60)
+            check_response_status(response, "火山引擎 TTS")
             if response.status_code == 200:
                 result = response.json()
                 if 'data' in result:
-                    import base64
-                    audio_data = base64.b64decode(result['data'])
-                    with open(output_path, 'wb') as f:
-                        f.write(audio_data)
+                    write_stream(output_path, iter_base64_decoded(result['data']))
+                    # 响应中携带音频时长（毫秒），直接登记，无需再探测
+                    duration = result.get('addition', {}).get('duration')
+                    if duration:
+                        self.durations.record(output_path, int(duration))
                     return True
                 else:
                     log_error(f"火山引擎 TTS 响应异常: {result}")
@@ -577,6 +2313,9 @@ class PPTToVideoConverter:
                 log_error(f"火山引擎 TTS 请求失败: {response.status_code} - {response.text}")
             return False
         except Exception as e:
+            retryable = retryable_error(e)
+            if retryable:
+                raise retryable
             log_error(f"火山引擎 TTS 生成失败: {e}")
             return False
 
@@ -588,16 +2327,21 @@ class PPTToVideoConverter:
                 log_error("智谱 AI TTS 需要设置环境变量: ZHIPUAI_API_KEY")
                 return False
 
-            client = ZhipuAI(api_key=api_key)
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice=self.voice,
-                input=text,
-            )
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            client = self.clients.zhipu(api_key)
+            request = dict(model="tts-1", voice=self.voice, input=text)
+            streaming = getattr(client.audio.speech, 'with_streaming_response', None)
+            if streaming is not None:
+                with streaming.create(**request) as response:
+                    write_stream(output_path, response.iter_bytes(STREAM_CHUNK_SIZE))
+            else:
+                # 旧版 SDK 不支持流式响应
+                response = client.audio.speech.create(**request)
+                write_stream(output_path, [response.content])
             return True
         except Exception as e:
+            retryable = retryable_error(e)
+            if retryable:
+                raise retryable
             log_error(f"智谱 AI TTS 生成失败: {e}")
             return False
 
@@ -610,20 +2354,60 @@ class PPTToVideoConverter:
                 "input": text,
                 "voice": self.voice,
             }
-            response = requests.post(url, json=payload, timeout=120)
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                return True
-            else:
-                log_error(f"Fish Speech 请求失败: {response.status_code}")
+            with self.clients.session.post(url, json=payload, timeout=120, stream=True) as response:
+                check_response_status(response, "Fish Speech")
+                if response.status_code == 200:
+                    write_stream(output_path, response.iter_content(STREAM_CHUNK_SIZE))
+                    return True
+                else:
+                    log_error(f"Fish Speech 请求失败: {response.status_code}")
             return False
         except Exception as e:
+            retryable = retryable_error(e)
+            if retryable:
+                raise retryable
             log_error(f"Fish Speech 生成失败: {e}")
             return False
 
+    def generate_audio_local(self, text: str, output_path: Path) -> bool:
+        """
+        使用本地引擎生成 WAV 音频（无需网络）
+
+        - piper: 神经网络语音，模型由 PIPER_MODEL 指定
+        - espeak-ng: 共振峰合成，语音名由 --voice 指定（默认 cmn / en-us）
+        - tone: 内置合成器，按字数估算时长生成提示音，输出完全确定（用于 CI 与基准测试）
+        """
+        engine = self.local_tts_engine()
+        if engine == 'tone':
+            duration_ms = write_tone_wav(output_path, estimate_speech_ms(text))
+            self.durations.record(output_path, duration_ms)
+            return True
+
+        part_path = output_path.with_name(f"{output_path.name}.{threading.get_ident()}.part")
+        if engine == 'piper':
+            cmd = ["piper", "--model", os.environ.get('PIPER_MODEL', ''), "--output_file", str(part_path)]
+        else:
+            cmd = ["espeak-ng", "-v", self.voice, "-w", str(part_path), "--stdin"]
+        try:
+            result = run_command(cmd, self.metrics, input_text=text)
+            if result.returncode != 0 or not part_path.exists():
+                log_error(f"本地 TTS（{engine}）生成失败: {result.stderr.strip()}")
+                return False
+            os.replace(part_path, output_path)
+        finally:
+            part_path.unlink(missing_ok=True)
+
+        duration_ms = wav_duration_ms(output_path)
+        if duration_ms is not None:
+            self.durations.record(output_path, duration_ms)
+        return True
+
     def generate_audio(self, text: str, output_path: Path) -> bool:
-        """生成单条音频"""
+        """生成单条音频（经由调度器限速、限并发并自动重试）"""
+        return self.scheduler.run(self.tts_provider, lambda: self._generate_audio_once(text, output_path))
+
+    def _generate_audio_once(self, text: str, output_path: Path) -> bool:
+        """按服务商发出一次 TTS 请求"""
         if self.tts_provider == "edge":
             return self.generate_audio_edge(text, output_path)
         elif self.tts_provider == "openai":
@@ -634,39 +2418,19 @@ class PPTToVideoConverter:
             return self.generate_audio_zhipu(text, output_path)
         elif self.tts_provider == "fish":
             return self.generate_audio_fish(text, output_path)
+        elif self.tts_provider == "local":
+            return self.generate_audio_local(text, output_path)
         return False
 
     def get_audio_duration(self, audio_path: Path) -> int:
-        """获取音频时长（毫秒）- 使用 ffprobe"""
-        try:
-            # 使用 ffprobe 获取音频时长（更可靠）
-            cmd = [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(audio_path)
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0 and result.stdout.strip():
-                duration = float(result.stdout.strip())
-                return int(duration * 1000)
-        except Exception as e:
-            log_warning(f"ffprobe 获取时长失败: {e}")
-
-        # Fallback: 尝试使用 mutagen
-        if HAS_MUTAGEN:
-            try:
-                audio = mutagen.File(str(audio_path))
-                if audio and hasattr(audio.info, 'length'):
-                    return int(audio.info.length * 1000)
-            except Exception:
-                pass
-
-        log_warning(f"无法获取音频时长: {audio_path.name}，使用默认5秒")
-        return 5000
+        """获取音频时长（毫秒）- 经由时长登记表，同一文件只探测一次"""
+        return self.durations.duration(audio_path)
 
     def get_audio_durations(self, audio_files: List[Optional[Path]]) -> List[int]:
         """获取所有音频的实际时长（毫秒）"""
+        # v3.4: 未登记的音频一次性批量探测
+        self.durations.probe([audio for audio in audio_files if audio and audio.exists()])
+
         durations = []
         for i, audio in enumerate(audio_files):
             if audio and audio.exists():
@@ -679,36 +2443,49 @@ class PPTToVideoConverter:
                 log_info(f"第 {i+1} 页无音频，使用默认5秒")
         return durations
 
-    def generate_silence(self, duration_ms: int, output_path: Path) -> bool:
-        """生成静音音频"""
-        duration_sec = duration_ms / 1000
-        cmd = [
-            "ffmpeg", "-y",
-            "-f", "lavfi",
-            "-i", f"anullsrc=r=44100:cl=stereo",
-            "-t", str(duration_sec),
-            "-c:a", "libmp3lame",
-            "-q:a", "9",
-            str(output_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        return result.returncode == 0
-
     def concat_audio(self, audio_files: List[Optional[Path]]) -> tuple:
         """
         简单拼接所有音频（v3.0 简化版）
 
         v3.0: 不再需要静音填充，直接拼接音频
         每页展示时间 = 该页音频时长，100% 同步
+        v3.4: 配音与静音均为统一格式的 PCM WAV，流复制拼接，不重新编码
 
         Returns:
             tuple: (final_audio_path, durations)
         """
         log_info("拼接音频轨道...")
 
+        concat_file, durations = self.write_audio_list(audio_files)
+        total_duration = sum(durations)
+
+        # 拼接音频
+        output_audio = self.audio_dir / "final_audio.wav"
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(concat_file),
+            "-c", "copy",
+            str(output_audio)
+        ]
+
+        result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"音频拼接失败: {result.stderr}")
+            raise RuntimeError("音频拼接失败")
+
+        log_success(f"音频拼接完成，总时长: {total_duration/1000:.1f}秒")
+        return output_audio, durations
+
+    def write_audio_list(self, audio_files: List[Optional[Path]]) -> tuple:
+        """
+        生成逐页配音的 concat 列表，无音频的页面填充 5 秒静音
+
+        Returns:
+            tuple: (concat_file, durations)
+        """
         segments = []
         durations = []
-        total_duration = 0
 
         for i, audio in enumerate(audio_files):
             if audio and audio.exists():
@@ -718,42 +2495,23 @@ class PPTToVideoConverter:
                     'duration': audio_duration
                 })
                 durations.append(audio_duration)
-                total_duration += audio_duration
             else:
-                # 没有音频，生成 5 秒静音
-                silence_path = self.audio_dir / f"silence_{i:03d}.mp3"
-                if self.generate_silence(5000, silence_path):
+                # 没有音频，使用 5 秒静音（同一时长的静音文件只生成一次）
+                silence_path = self.durations.silence(5000)
+                if silence_path:
                     segments.append({
                         'path': silence_path,
                         'duration': 5000
                     })
                     durations.append(5000)
-                    total_duration += 5000
 
         # 生成 concat 文件
         concat_file = self.audio_dir / "concat_list.txt"
         with open(concat_file, 'w') as f:
             for seg in segments:
-                f.write(f"file '{seg['path']}'\n")
+                f.write(concat_line(seg['path']))
 
-        # 拼接音频
-        output_audio = self.audio_dir / "final_audio.mp3"
-        cmd = [
-            "ffmpeg", "-y",
-            "-f", "concat", "-safe", "0",
-            "-i", str(concat_file),
-            "-c:a", "libmp3lame",
-            "-q:a", "2",
-            str(output_audio)
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            log_error(f"音频拼接失败: {result.stderr}")
-            raise RuntimeError("音频拼接失败")
-
-        log_success(f"音频拼接完成，总时长: {total_duration/1000:.1f}秒")
-        return output_audio, durations
+        return concat_file, durations
 
     def compose_video(self, screenshot_durations: List[int]) -> Path:
         """
@@ -765,15 +2523,9 @@ class PPTToVideoConverter:
         log_step("合成", "正在合成视频...")
 
         # 生成图片序列文件
+        frame_paths = [frame['path'] for frames in self.slide_frames for frame in frames]
         concat_file = self.temp_dir / "slides.txt"
-        with open(concat_file, 'w') as f:
-            for i, duration in enumerate(screenshot_durations):
-                slide_path = self.slides_dir / f"slide_{i:04d}.png"
-                f.write(f"file '{slide_path}'\n")
-                f.write(f"duration {duration / 1000:.3f}\n")
-            # 最后一帧
-            last_slide = self.slides_dir / f"slide_{len(screenshot_durations)-1:04d}.png"
-            f.write(f"file '{last_slide}'\n")
+        self.write_frames_list(concat_file, list(zip(frame_paths, screenshot_durations)))
 
         # 生成视频轨道
         video_only = self.temp_dir / "video_only.mp4"
@@ -781,24 +2533,19 @@ class PPTToVideoConverter:
             "ffmpeg", "-y",
             "-f", "concat", "-safe", "0",
             "-i", str(concat_file),
-            "-vf", f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,"
-                   f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2:black",
-            "-c:v", "libx264",
-            "-preset", "medium",
-            "-crf", "23",
-            "-r", str(self.fps),
-            "-pix_fmt", "yuv420p",
+            "-vf", self.video_filter(),
+            *self.video_encode_args(),
             str(video_only)
         ]
 
         log_info("生成视频轨道...")
-        result = subprocess.run(video_cmd, capture_output=True, text=True)
+        result = run_command(video_cmd, self.metrics)
         if result.returncode != 0:
             log_error(f"视频生成失败: {result.stderr}")
             raise RuntimeError("视频生成失败")
 
-        # 合并视频和音频
-        final_audio = self.audio_dir / "final_audio.mp3"
+        # 合并视频和音频（音轨只在此编码一次 AAC）
+        final_audio = self.audio_dir / "final_audio.wav"
         log_info("合并视频和音频...")
         final_cmd = [
             "ffmpeg", "-y",
@@ -813,7 +2560,7 @@ class PPTToVideoConverter:
             str(self.output)
         ]
 
-        result = subprocess.run(final_cmd, capture_output=True, text=True)
+        result = run_command(final_cmd, self.metrics)
         if result.returncode != 0:
             log_error(f"音视频合并失败: {result.stderr}")
             raise RuntimeError("音视频合并失败")
@@ -821,19 +2568,405 @@ class PPTToVideoConverter:
         log_success(f"视频已生成: {self.output}")
         return self.output
 
+    def write_frames_list(self, concat_file: Path, frames: List[tuple]) -> None:
+        """
+        写入图片序列 concat 列表（最后一帧需重复一次，否则其时长会被忽略）
+
+        相邻的相同截图合并为一条，时长相加，减少编码输入；时长为 0 的截图跳过。
+        """
+        merged = []
+        for path, duration in frames:
+            if duration <= 0:
+                continue
+            if merged and merged[-1][0] == path:
+                merged[-1][1] += duration
+            else:
+                merged.append([path, duration])
+
+        with open(concat_file, 'w') as f:
+            for path, duration in merged:
+                f.write(concat_line(path))
+                f.write(f"duration {duration / 1000:.3f}\n")
+            if merged:
+                f.write(concat_line(merged[-1][0]))
+
+    def video_encode_args(self, profile_name: Optional[str] = None, codec: Optional[str] = None) -> List[str]:
+        """根据编码配置生成 ffmpeg 视频编码参数"""
+        profile = self.ENCODING_PROFILES[profile_name or self.encoding_profile]
+        codec = codec or self.video_codec
+        options = profile[codec]
+        fps = profile['fps'] or self.fps
+
+        args = ["-c:v", codec, "-preset", str(options['preset']), "-crf", str(options['crf'])]
+        if codec == "libx264":
+            args += ["-tune", "stillimage"]
+        elif codec == "libx265":
+            # 兼容 Apple 播放器
+            args += ["-tag:v", "hvc1"]
+
+        if profile['vfr']:
+            # 可变帧率：每张截图只输出一帧，帧率仅作为时间戳上限
+            # -fps_mode 自 ffmpeg 5.1 起可用，旧版本（4.x）使用 -vsync
+            version = self.ffmpeg_version()
+            fps_mode = "-vsync" if version and version < (5, 1) else "-fps_mode"
+            args += [fps_mode, "vfr", "-r", str(fps)]
+        else:
+            args += ["-r", str(fps)]
+
+        args += ["-g", str(int(fps * profile['gop_seconds'])), "-pix_fmt", "yuv420p"]
+        return args
+
+    def ffmpeg_version(self) -> Optional[tuple]:
+        """ffmpeg 主次版本号（只探测一次）；无法解析（如 git 快照构建）时返回 None，按新版本处理"""
+        if self._ffmpeg_version is None:
+            try:
+                result = run_command(["ffmpeg", "-hide_banner", "-version"], self.metrics)
+                match = re.search(r"ffmpeg version n?(\d+)\.(\d+)", result.stdout)
+            except OSError:
+                match = None
+            self._ffmpeg_version = (int(match.group(1)), int(match.group(2))) if match else ()
+        return self._ffmpeg_version or None
+
+    def available_video_codecs(self) -> List[str]:
+        """当前 ffmpeg 支持的视频编码器"""
+        result = run_command(["ffmpeg", "-hide_banner", "-encoders"], self.metrics)
+        return [codec for codec in self.VIDEO_CODECS if f" {codec} " in result.stdout]
+
+    def benchmark_profiles(self) -> List[Dict[str, Any]]:
+        """
+        编码配置基准测试
+
+        对当前幻灯片截图（时长按讲解文字字数估算，约每秒 4 字），用每个编码配置 ×
+        每个可用编码器各编码一次视频轨道，打印编码耗时与文件大小对比表。
+        不调用 TTS，也不生成最终视频。
+        """
+        log_step("基准", "正在测试编码配置...")
+
+        narrations = self.extract_narrations_from_html()
+        self.slide_keys = self.compute_slide_keys(narrations)
+        durations = [max(1500, len(text) * 250) for text in narrations]
+        _, screenshot_durations, _ = self.capture_slides(durations, narrations)
+
+        frame_paths = [frame['path'] for frames in self.slide_frames for frame in frames]
+        frames_file = self.temp_dir / "benchmark_slides.txt"
+        self.write_frames_list(frames_file, list(zip(frame_paths, screenshot_durations)))
+        video_seconds = sum(screenshot_durations) / 1000
+
+        rows = []
+        for codec in self.available_video_codecs():
+            for profile_name in self.ENCODING_PROFILES:
+                output = self.temp_dir / f"benchmark_{profile_name}_{codec}.mp4"
+                cmd = [
+                    "ffmpeg", "-y",
+                    "-f", "concat", "-safe", "0",
+                    "-i", str(frames_file),
+                    "-vf", self.video_filter(),
+                    *self.video_encode_args(profile_name, codec),
+                    str(output)
+                ]
+                start = time.perf_counter()
+                result = run_command(cmd, self.metrics)
+                elapsed = time.perf_counter() - start
+                if result.returncode != 0:
+                    log_warning(f"{profile_name} / {codec} 编码失败，已跳过")
+                    continue
+                rows.append({
+                    'profile': profile_name,
+                    'codec': codec,
+                    'seconds': round(elapsed, 2),
+                    'speed': round(video_seconds / elapsed, 1) if elapsed else 0,
+                    'size_kb': output.stat().st_size // 1024,
+                })
+
+        print(f"\n{Colors.BOLD}编码配置对比（视频时长 {video_seconds:.1f} 秒，{len(frame_paths)} 张截图）:{Colors.END}\n")
+        print(f"  {'配置':<12}{'编码器':<12}{'耗时(秒)':>10}{'倍速':>8}{'大小(KB)':>12}")
+        for row in rows:
+            print(f"  {row['profile']:<12}{row['codec']:<12}{row['seconds']:>10}{row['speed']:>7}x{row['size_kb']:>12}")
+        print()
+        return rows
+
+    def video_filter(self) -> str:
+        """缩放并填充到目标分辨率"""
+        return (f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,"
+                f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2:black")
+
+    def compose_video_single_pass(self, audio_files: List[Optional[Path]], screenshot_durations: List[int]) -> Path:
+        """
+        单次合成视频（v3.4）
+
+        图片序列列表与逐页配音列表作为两个 concat 输入交给同一个 ffmpeg，
+        直接输出最终 MP4：不生成 video_only.mp4 / final_audio.wav，
+        视频只编码一次，配音（已统一为 PCM）只做一次有损编码（AAC）。
+        """
+        log_step("合成", "正在单次合成视频...")
+
+        frame_paths = [frame['path'] for frames in self.slide_frames for frame in frames]
+        frames_file = self.temp_dir / "slides.txt"
+        self.write_frames_list(frames_file, list(zip(frame_paths, screenshot_durations)))
+
+        audio_list, _ = self.write_audio_list(audio_files)
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(frames_file),
+            "-f", "concat", "-safe", "0",
+            "-i", str(audio_list),
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-vf", self.video_filter(),
+            *self.video_encode_args(),
+            "-c:a", "aac",
+            "-b:a", "192k",
+            "-shortest",
+            "-movflags", "+faststart",
+            str(self.output)
+        ]
+
+        result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"视频合成失败: {result.stderr}")
+            raise RuntimeError("视频合成失败")
+
+        log_success(f"视频已生成: {self.output}")
+        return self.output
+
+    def encode_slide_segment(self, slide_idx: int, audio: Optional[Path], duration_ms: int) -> Path:
+        """
+        将单页（截图序列 + 配音）编码为独立视频片段
+
+        所有片段使用相同的编码参数（分辨率、帧率、像素格式、采样率、声道），
+        以便最终用 concat demuxer 流复制拼接。片段按输入哈希命名，已存在时直接复用。
+        """
+        segment_path = self.segment_path_for(slide_idx, audio, duration_ms)
+        self.segment_names.add(segment_path.name)
+        if segment_path.exists() and segment_path.stat().st_size > 0:
+            self.release_frames(slide_idx)
+            return segment_path
+
+        frames = [(frame['path'], frame['duration']) for frame in self.slide_frames[slide_idx]]
+        frames_file = self.segments_dir / f"frames_{slide_idx:03d}.txt"
+        self.write_frames_list(frames_file, frames)
+
+        # 先写入临时文件，编码成功后再改名，避免中断留下不完整的片段被复用
+        partial_path = segment_path.with_name(segment_path.stem + ".partial.mp4")
+        duration_sec = f"{duration_ms / 1000:.3f}"
+
+        if audio and audio.exists():
+            audio_input = ["-i", str(audio)]
+        else:
+            audio_input = ["-f", "lavfi", "-t", duration_sec, "-i", "anullsrc=r=44100:cl=stereo"]
+
+        # 每个 ffmpeg 进程分到的线程数，避免并行时过度抢占 CPU
+        threads = max(1, (os.cpu_count() or 1) // self.jobs)
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(frames_file),
+            *audio_input,
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-vf", self.video_filter(),
+            *self.video_encode_args(),
+            "-threads", str(threads),
+            "-af", "apad",
+            "-c:a", "aac",
+            "-b:a", "192k",
+            "-ar", "44100",
+            "-ac", "2",
+            "-t", duration_sec,
+            str(partial_path)
+        ]
+
+        with self.metrics.slide(slide_idx, 'encode'):
+            result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"第 {slide_idx+1} 页片段编码失败: {result.stderr}")
+            raise RuntimeError(f"第 {slide_idx+1} 页片段编码失败")
+
+        os.replace(partial_path, segment_path)
+        self.metrics.add_bytes('segments', segment_path.stat().st_size)
+        self.disk.add(segment_path.stat().st_size)
+        self.release_frames(slide_idx)
+        return segment_path
+
+    def start_hls(self, durations_ms: Optional[List[int]] = None):
+        """
+        创建 HLS 播放列表（仅 --format hls）
+
+        durations_ms 为全部页面的最终时长；流水线模式下时长尚未确定，
+        全部配音完成后再调用 self.hls.pin()。
+        """
+        if self.output_format == "hls":
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self.hls = HLSPlaylist(self.output, self.remux_to_ts, durations_ms)
+            log_info(f"HLS 播放列表: {self.output}（页面编码完成即可播放）")
+
+    def remux_to_ts(self, segment: Path, ts_path: Path, offset_seconds: float):
+        """流复制将片段转封装为 MPEG-TS，时间戳从 offset_seconds 开始"""
+        partial_path = ts_path.with_name(ts_path.name + ".partial")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(segment),
+            "-c", "copy",
+            "-output_ts_offset", f"{offset_seconds:.3f}",
+            "-muxdelay", "0",
+            "-f", "mpegts",
+            str(partial_path)
+        ]
+        result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"TS 分片转封装失败: {result.stderr}")
+            raise RuntimeError("TS 分片转封装失败")
+        os.replace(partial_path, ts_path)
+
+    def encode_and_publish(self, slide_idx: int, audio: Optional[Path], duration_ms: int) -> Path:
+        """编码单页片段；HLS 输出时立即追加到播放列表"""
+        segment = self.encode_slide_segment(slide_idx, audio, duration_ms)
+        if self.hls is not None:
+            self.hls.add(slide_idx, segment, duration_ms)
+        return segment
+
+    def finalize_output(self, segments: List[Path]) -> Path:
+        """输出最终结果：MP4 流复制拼接全部片段；HLS 结束播放列表"""
+        if self.hls is not None:
+            self.hls.close(len(segments))
+            log_success(f"HLS 播放列表已完成: {self.output}")
+            return self.output
+        log_info("流复制拼接片段...")
+        self.concat_segments(segments)
+        log_success(f"视频已生成: {self.output}")
+        return self.output
+
+    def concat_segments(self, segments: List[Path]) -> Path:
+        """使用 concat demuxer 流复制拼接所有片段（不重新编码）"""
+        concat_file = self.segments_dir / "segments.txt"
+        with open(concat_file, 'w') as f:
+            for segment in segments:
+                f.write(concat_line(segment))
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", str(concat_file),
+            "-c", "copy",
+            "-movflags", "+faststart",
+            str(self.output)
+        ]
+        with self.metrics.stage('concat'):
+            result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"片段拼接失败: {result.stderr}")
+            raise RuntimeError("片段拼接失败")
+
+        return self.output
+
+    def compose_video_segments(self, audio_files: List[Optional[Path]], audio_durations: List[int]) -> Path:
+        """
+        分段合成视频（v3.4）
+
+        每页独立编码为一个片段，按 --jobs 并行执行，最后流复制拼接。
+        编码耗时随 CPU 核数线性下降。
+        """
+        log_step("合成", f"正在分段编码 {len(self.slide_frames)} 个片段（{self.jobs} 路并行）...")
+
+        durations = [
+            audio_durations[slide_idx] if slide_idx < len(audio_durations)
+            else sum(frame['duration'] for frame in self.slide_frames[slide_idx])
+            for slide_idx in range(len(self.slide_frames))
+        ]
+        self.start_hls(durations)
+
+        def _encode(slide_idx: int) -> Path:
+            audio = audio_files[slide_idx] if slide_idx < len(audio_files) else None
+            reused = self.segment_path_for(slide_idx, audio, durations[slide_idx]).exists()
+            segment = self.encode_and_publish(slide_idx, audio, durations[slide_idx])
+            action = "复用" if reused else "编码完成"
+            log_info(f"第 {slide_idx+1}/{len(self.slide_frames)} 页片段{action}")
+            return segment
+
+        with self.encode_pool() as executor:
+            segments = list(executor.map(_encode, range(len(self.slide_frames))))
+
+        return self.finalize_output(segments)
+
     def extract_narrations_from_html(self) -> List[str]:
-        """从 HTML 提取讲解文字"""
+        """
+        从 HTML 提取讲解文字
+
+        v3.4: 用 html.parser 解析源文件得到讲解文字与片段哈希，不启动浏览器；
+        源码中没有 .slide 元素（页面由脚本生成）时回退到浏览器提取。
+        指定 --slides-json 时讲解文字取自源 JSON。
+        """
         log_step("提取", "正在提取讲解文字...")
 
+        parser = SlideHTMLParser(self.html_path.read_text(encoding='utf-8'))
+        if parser.slides:
+            self.deck_hash = self.hash_inputs(parser.head)
+            self.slide_fragments = [self.hash_inputs(slide['html']) for slide in parser.slides]
+            narrations = [parser.narration(i) or f"第 {i+1} 页" for i in range(len(parser.slides))]
+            self.slide_count = len(narrations)
+        else:
+            log_warning("源码中未找到 .slide 元素，使用浏览器提取")
+            with self.browser_pool() as pool:
+                narrations = pool.submit(self.in_browser, self._extract_narrations).result()
+
+        if self.slides_json:
+            narrations = self.apply_slides_json(narrations)
+        return narrations
+
+    @staticmethod
+    def slide_json_text(slide: Dict[str, Any]) -> str:
+        """按 generate_html.py 的版式取一页的讲解文字"""
+        narration = slide.get('narration')
+        if isinstance(narration, str) and narration.strip():
+            parts = [narration]
+        else:
+            slide_type = slide.get('type', 'content')
+            # 引用页只显示正文；封面与结尾页为标题 + 副标题；内容页另有要点列表
+            parts = [] if slide_type == 'quote' else [slide.get('title')]
+            parts.append(slide.get('content'))
+            if slide_type not in ('cover', 'quote', 'ending') and isinstance(slide.get('bullets'), list):
+                parts.extend(slide['bullets'])
+        texts = [re.sub(r'<[^>]+>', ' ', part) for part in parts if isinstance(part, str)]
+        return re.sub(r'\s+', ' ', ' '.join(texts)).strip()
+
+    def apply_slides_json(self, narrations: List[str]) -> List[str]:
+        """
+        用源 slides JSON 的文字替换讲解文字
+
+        每页优先取 narration；否则按 generate_html.py 的版式拼接标题、正文与要点
+        （去除 HTML 标签，忽略非字符串字段）。页数以 HTML 为准，页数不一致时只替换对应的页。
+        """
+        with open(self.slides_json, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        slides = data.get('slides', []) if isinstance(data, dict) else data
+        if len(slides) != len(narrations):
+            log_warning(f"slides JSON 有 {len(slides)} 页，HTML 有 {len(narrations)} 页，仅替换对应的页")
+        for i, slide in enumerate(slides[:len(narrations)]):
+            if not isinstance(slide, dict):
+                continue
+            text = self.slide_json_text(slide)
+            if text:
+                narrations[i] = text
+        log_info(f"讲解文字取自: {self.slides_json}")
+        return narrations
+
+    def _extract_narrations(self, browser) -> List[str]:
+        """在浏览器中读取每页讲解文字与 HTML 片段哈希"""
         narrations = []
+        self.slide_fragments = []
 
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page(viewport={'width': self.width, 'height': self.height})
+        page = browser.new_page(viewport={'width': self.width, 'height': self.height})
+        try:
             page.goto(f"file://{self.html_path}")
-
             total = page.evaluate("document.querySelectorAll('.slide').length")
 
+            # v3.4: 记录页面公共部分与每页 HTML 片段的哈希，用于增量重建
+            self.deck_hash = self.hash_inputs(page.evaluate("document.head.innerHTML"))
+            fragments = page.evaluate("Array.from(document.querySelectorAll('.slide')).map(s => s.outerHTML)")
+            self.slide_fragments = [self.hash_inputs(fragment) for fragment in fragments]
+
             for i in range(total):
                 narration = page.evaluate(f"""
                     (() => {{
@@ -868,37 +3001,217 @@ class PPTToVideoConverter:
                 """)
 
                 narrations.append(narration if narration else f"第 {i+1} 页")
-
-            browser.close()
+        finally:
+            page.close()
 
         self.slide_count = total
         return narrations
 
-    def generate_all_audio(self, narrations: List[str]) -> List[Optional[Path]]:
-        """生成所有讲解音频"""
-        log_step("配音", f"正在使用 {self.tts_provider.upper()} TTS 生成语音...")
+    def generate_slide_audio(self, slide_idx: int, text: str, total: int) -> Optional[Path]:
+        """生成单页配音；输入未变化时复用已有音频"""
+        if not text or not text.strip():
+            log_warning(f"第 {slide_idx+1} 页无讲解文字")
+            return None
+
+        output_path = self.audio_path_for(slide_idx)
+        if output_path.exists() and output_path.stat().st_size > 0:
+            log_info(f"复用第 {slide_idx+1}/{total} 页配音（输入未变化）")
+            return self.normalize_audio(output_path) if self.pcm_audio else output_path
+
+        log_info(f"生成第 {slide_idx+1}/{total} 页配音...")
+
+        # TTS 结果不确定：同名重新合成时，旧的时长登记与派生的 PCM 均已失效
+        pcm_path = self.pcm_path_for(output_path)
+        self.durations.forget(output_path)
+        self.durations.forget(pcm_path)
+        pcm_path.unlink(missing_ok=True)
+
+        with self.metrics.slide(slide_idx, 'tts'):
+            ok = self.generate_audio(text, output_path)
+        if ok:
+            # 文件已完整写入：立即登记时长（TTS 已返回时长时直接使用），不必等待全部配音完成
+            self.durations.inspect(output_path)
+            self.metrics.add_bytes('audio', output_path.stat().st_size)
+            self.disk.add(output_path.stat().st_size)
+            return self.normalize_audio(output_path) if self.pcm_audio else output_path
+
+        # 删除可能残留的不完整文件，避免下次被当作缓存复用
+        output_path.unlink(missing_ok=True)
+        return None
+
+    def normalize_audio(self, audio: Path) -> Optional[Path]:
+        """
+        将配音解码为统一格式的 PCM WAV（single-pass / two-pass），每个文件只转换一次
 
-        audio_files = []
+        格式一致的 PCM 可由 concat 流复制拼接：没有 MP3 重新编码，也没有逐段编码延迟
+        累积的音画偏移；整条音轨只在最终封装时编码一次 AAC。时长从 WAV 头读取。
+        """
+        pcm_path = self.pcm_path_for(audio)
+        if pcm_path.exists() and pcm_path.stat().st_size > 0:
+            return pcm_path
 
-        for i, text in enumerate(narrations):
-            if not text or not text.strip():
-                log_warning(f"第 {i+1} 页无讲解文字")
-                audio_files.append(None)
-                continue
+        # 先写临时文件再改名，避免中断留下不完整的文件被复用
+        partial_path = pcm_path.with_name(f"{pcm_path.name}.{threading.get_ident()}.part")
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", str(audio),
+            "-ac", "1",
+            "-ar", str(PCM_SAMPLE_RATE),
+            "-c:a", "pcm_s16le",
+            "-f", "wav",
+            str(partial_path)
+        ]
+        result = run_command(cmd, self.metrics)
+        if result.returncode != 0:
+            log_error(f"配音转换为 PCM 失败: {audio.name}: {result.stderr}")
+            partial_path.unlink(missing_ok=True)
+            return None
+        os.replace(partial_path, pcm_path)
+
+        duration = wav_duration_ms(pcm_path)
+        if duration:
+            self.durations.record(pcm_path, duration)
+        self.metrics.add_bytes('audio', pcm_path.stat().st_size)
+        self.disk.add(pcm_path.stat().st_size)
+        return pcm_path
+
+    def log_tts_metrics(self):
+        """输出 TTS 请求统计"""
+        stats = self.scheduler.metrics().get(self.tts_provider)
+        if stats and (stats['throttled'] or stats['retries'] or stats['failed']):
+            log_info(f"TTS 请求 {stats['requests']:.0f} 次：限流 {stats['throttled']:.0f} 次，"
+                     f"重试 {stats['retries']:.0f} 次，失败 {stats['failed']:.0f} 次，"
+                     f"等待 {stats['wait_seconds']:.1f} 秒")
 
-            log_info(f"生成第 {i+1}/{len(narrations)} 页配音...")
-            output_path = self.audio_dir / f"narration_{i:03d}.mp3"
+    def generate_all_audio(self, narrations: List[str]) -> List[Optional[Path]]:
+        """生成所有讲解音频"""
+        log_step("配音", f"正在使用 {self.tts_provider.upper()} TTS 生成语音...")
 
-            if self.generate_audio(text, output_path):
-                audio_files.append(output_path)
-            else:
-                audio_files.append(None)
+        with ThreadPoolExecutor(max_workers=self.tts_workers) as executor:
+            audio_files = list(executor.map(
+                lambda item: self.generate_slide_audio(item[0], item[1], len(narrations)),
+                enumerate(narrations)
+            ))
 
         success_count = sum(1 for f in audio_files if f is not None)
         log_success(f"已生成 {success_count}/{len(narrations)} 条音频")
+        self.log_tts_metrics()
 
         return audio_files
 
+    def convert_pipelined(self, narrations: List[str]) -> Path:
+        """
+        流水线转换（v3.4）
+
+        截图并不依赖音频（只有截图时长依赖），因此：
+        - 截图线程独占浏览器，逐页截图
+        - TTS 线程池并行合成配音
+        - 某页音频与截图都就绪后，立即提交该页片段编码
+        总耗时趋近 max(TTS, 截图, 编码)，而不是三者之和。
+        """
+        total = len(narrations)
+        log_step("流水线", f"截图 / {self.tts_workers} 路 TTS / {self.jobs} 路编码 并行执行...")
+
+        slide_sentences, slide_paths = self.plan_capture(narrations)
+        self.slide_frames = [[] for _ in range(total)]
+
+        # 每页截图完成的 Future；可复用的页面立即完成
+        frame_futures: List[Future] = [Future() for _ in range(total)]
+        for slide_idx, paths in enumerate(slide_paths):
+            if paths is not None:
+                frame_futures[slide_idx].set_result(paths)
+
+        def _capture():
+            try:
+                self._capture_pending(
+                    narrations, slide_sentences, slide_paths,
+                    on_captured=lambda idx, paths: frame_futures[idx].set_result(paths)
+                )
+            except BaseException as e:
+                for future in frame_futures:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for slide_idx, future in enumerate(frame_futures):
+                if not future.done():
+                    future.set_exception(RuntimeError(f"第 {slide_idx+1} 页未找到对应的幻灯片"))
+
+        capture_thread = None
+        if any(paths is None for paths in slide_paths):
+            capture_thread = threading.Thread(target=_capture, name="capture", daemon=True)
+            capture_thread.start()
+
+        audio_files: List[Optional[Path]] = [None] * total
+        audio_durations = [5000] * total
+        encode_futures: Dict[int, Future] = {}
+        self.start_hls()
+        audio_done = 0
+
+        with ThreadPoolExecutor(max_workers=self.tts_workers) as tts_pool, \
+                self.encode_pool() as encode_pool:
+            audio_futures = [
+                tts_pool.submit(self.generate_slide_audio, i, text, total)
+                for i, text in enumerate(narrations)
+            ]
+
+            try:
+                waiting = {}
+                for slide_idx in range(total):
+                    waiting[audio_futures[slide_idx]] = ('audio', slide_idx)
+                    waiting[frame_futures[slide_idx]] = ('frames', slide_idx)
+                ready = {slide_idx: set() for slide_idx in range(total)}
+
+                while waiting:
+                    done, _ = wait(list(waiting), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        kind, slide_idx = waiting.pop(future)
+                        if kind == 'audio':
+                            audio = future.result()
+                            audio_files[slide_idx] = audio
+                            if audio:
+                                audio_durations[slide_idx] = self.get_audio_duration(audio)
+                            audio_done += 1
+                            if audio_done == total and self.hls is not None:
+                                # 全部页面时长已知：确定 HLS 的 TARGETDURATION 并开始写入播放列表
+                                self.hls.pin(audio_durations)
+                        else:
+                            future.result()
+                        ready[slide_idx].add(kind)
+
+                        if len(ready[slide_idx]) == 2:
+                            # 该页音频与截图均就绪：分配截图时长并提交编码
+                            self.slide_frames[slide_idx] = self.timed_frames(
+                                slide_sentences[slide_idx], slide_paths[slide_idx], audio_durations[slide_idx],
+                                self.slide_motion.get(slide_idx)
+                            )
+                            encode_futures[slide_idx] = encode_pool.submit(
+                                self.encode_and_publish, slide_idx, audio_files[slide_idx], audio_durations[slide_idx]
+                            )
+
+                segments = [encode_futures[slide_idx].result() for slide_idx in range(total)]
+            except BaseException:
+                # 快速失败：取消尚未开始的配音与编码、停止截图，不再等待将被丢弃的结果
+                # （编码线程池可能由批量任务共享，只取消本任务提交的编码）
+                tts_pool.shutdown(wait=False, cancel_futures=True)
+                for future in encode_futures.values():
+                    future.cancel()
+                self.capture_cancel.set()
+                if capture_thread:
+                    capture_thread.join()
+                raise
+
+        self.log_tts_metrics()
+
+        if capture_thread:
+            capture_thread.join()
+        self.save_manifest()
+
+        self.total_duration_ms = sum(audio_durations)
+        total_duration = self.total_duration_ms / 1000
+        log_info(f"视频总时长: {total_duration:.1f}秒 ({total_duration/60:.1f}分钟)")
+
+        return self.finalize_output(segments)
+
     def convert(self) -> Path:
         """
         执行完整转换流程
@@ -909,20 +3222,44 @@ class PPTToVideoConverter:
         3. 根据音频时长截图（v3.2: 按句子分割字幕，逐句显示）
         4. 拼接音频
         5. 合成视频（视频时长 = 音频时长，100% 同步）
+
+        v3.4: 默认分段模式，每页独立编码后流复制拼接，无需整体拼接音频
+        v3.4: 指定工作目录时按 manifest 增量重建，仅重新生成输入变化的页面
+        v3.4: --pipeline 时 2-5 步以流水线并行执行（见 convert_pipelined）
+        v3.4: --resume 时按检查点跳过已完成的阶段；配音、截图、片段按页复用
         """
         log_info(f"开始转换: {self.html_path}")
         log_info(f"输出路径: {self.output}")
         log_info(f"分辨率: {self.resolution}")
         log_info(f"TTS 服务: {self.tts_provider}")
         log_info(f"语音: {self.voice}")
+        log_info(f"合成模式: {self.compose_mode}（{self.jobs} 路并行）")
+        log_info(f"编码配置: {self.encoding_profile} / {self.video_codec}")
         if self.subtitle:
             log_info(f"字幕: 已启用单行模式 (字体: {self.subtitle_font})")
 
         if not self.check_dependencies():
             raise RuntimeError("依赖检查失败")
 
-        # 1. 提取讲解文字
-        narrations = self.extract_narrations_from_html()
+        if self.resume:
+            completed = [stage for stage in ('extract', 'compose') if self.stage_done(stage)]
+            log_info(f"断点续转: {self.temp_dir}（已完成阶段: {', '.join(completed) or '无'}；"
+                     f"配音、截图与分段按页复用）")
+            if self.stage_done('compose') and self.output.exists():
+                # 不调用 finish()：此时未计算页面键，清理会误删缓存
+                log_success(f"视频已生成，无需重新转换: {self.output}")
+                if self.owns_clients:
+                    self.clients.close()
+                return self.output
+
+        # 1. 提取讲解文字（续转时从检查点恢复）
+        narrations = self.restore_narrations()
+        if narrations is None:
+            with self.metrics.stage('extract'):
+                narrations = self.extract_narrations_from_html()
+            self.mark_stage('extract', narrations=narrations, fragments=self.slide_fragments,
+                            deck_hash=self.deck_hash)
+        self.slide_keys = self.compute_slide_keys(narrations)
 
         # 显示讲解文字预览
         log_info("讲解文字预览:")
@@ -930,38 +3267,291 @@ class PPTToVideoConverter:
             preview = text[:60] + "..." if len(text) > 60 else text
             print(f"  [{i+1}] {preview}")
 
+        if self.pipeline:
+            # 2-5. 截图、TTS、编码流水线并行
+            with self.metrics.stage('pipeline'):
+                result = self.convert_pipelined(narrations)
+            self.mark_stage('compose')
+            self.finish()
+            return result
+
         # 2. 先生成所有音频（v3.0 核心改进：音频驱动）
-        audio_files = self.generate_all_audio(narrations)
+        with self.metrics.stage('tts'):
+            audio_files = self.generate_all_audio(narrations)
 
         # 3. 获取每段音频的实际时长
-        audio_durations = self.get_audio_durations(audio_files)
-        total_duration = sum(audio_durations) / 1000
+        with self.metrics.stage('durations'):
+            audio_durations = self.get_audio_durations(audio_files)
+        self.save_manifest()
+        self.total_duration_ms = sum(audio_durations)
+        total_duration = self.total_duration_ms / 1000
         log_info(f"预计视频总时长: {total_duration:.1f}秒 ({total_duration/60:.1f}分钟)")
 
         # 4. 根据音频时长截图（v3.2: 返回截图时长和字幕列表）
-        screenshot_count, screenshot_durations, screenshot_subtitles = self.capture_slides(audio_durations, narrations)
+        with self.metrics.stage('capture'):
+            screenshot_count, screenshot_durations, screenshot_subtitles = self.capture_slides(audio_durations, narrations)
         log_info(f"生成 {screenshot_count} 张截图（字幕按句子分割）")
+        self.save_manifest()
+
+        with self.metrics.stage('compose'):
+            if self.compose_mode == "segments":
+                # 5. 分段编码并流复制拼接
+                result = self.compose_video_segments(audio_files, audio_durations)
+            elif self.compose_mode == "single-pass":
+                # 5. 图片序列 + 配音列表一次合成
+                result = self.compose_video_single_pass(audio_files, screenshot_durations)
+            else:
+                # 5. 拼接音频
+                self.concat_audio(audio_files)
 
-        # 5. 拼接音频
-        self.concat_audio(audio_files)
+                # 6. 合成视频（使用截图时长，确保字幕同步）
+                result = self.compose_video(screenshot_durations)
 
-        # 6. 合成视频（使用截图时长，确保字幕同步）
-        result = self.compose_video(screenshot_durations)
+        self.mark_stage('compose')
+        self.finish()
+        return result
 
-        # 7. 清理
-        if not self.keep_temp:
+    def metrics_report(self) -> Dict[str, Any]:
+        """转换统计报告（--metrics-out），含工作目录占用与吞吐"""
+        work_dir_bytes = self.work_dir_bytes if self.work_dir_bytes is not None else self.disk_usage()
+        output_bytes = self.output.stat().st_size if self.output.exists() else 0
+        report = self.metrics.report(
+            html=str(self.html_path),
+            output=str(self.output),
+            slides=self.slide_count,
+            video_seconds=self.total_duration_ms / 1000,
+            output_bytes=output_bytes,
+            work_dir_bytes=work_dir_bytes,
+            peak_work_dir_bytes=max(self.disk.peak, work_dir_bytes),
+            disk_budget_bytes=self.disk.limit,
+            frames_released=self.frames_released,
+            tts=self.scheduler.metrics().get(self.tts_provider, {}),
+        )
+        wall = report['wall_seconds']
+        report['video_seconds_per_wall_second'] = report['video_seconds'] / wall if wall > 0 else 0.0
+        return report
+
+    def disk_usage(self) -> int:
+        """工作目录当前占用的字节数"""
+        if not self.temp_dir.exists():
+            return 0
+        return sum(path.stat().st_size for path in self.temp_dir.rglob("*") if path.is_file())
+
+    def write_metrics(self, path: str):
+        """写入 JSON 统计报告"""
+        report = self.metrics_report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        log_info(f"统计报告已写入: {path}")
+
+    def finish(self):
+        """转换完成后的清理（持久工作目录只删除不再被引用的缓存）"""
+        if self.owns_clients:
+            self.clients.close()
+
+        # 清理前记录工作目录占用（统计报告使用）
+        self.work_dir_bytes = self.disk_usage()
+        if self.disk.limit is not None or self.frames_released:
+            log_info(f"工作目录峰值占用: {self.disk.peak / 1024 / 1024:.1f} MB"
+                     f"（提前清理 {self.frames_released} 张截图）")
+
+        if self.persistent:
+            self.prune_work_dir()
+            self.save_manifest()
+            log_info(f"工作目录已保留，供增量重建: {self.temp_dir}")
+        elif not self.keep_temp:
             log_info("清理临时文件...")
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
         log_success("转换完成!")
-        return result
 
     def cleanup(self):
-        """清理临时文件"""
+        """清理临时文件（持久工作目录保留，以便下次增量重建）"""
+        if self.owns_clients:
+            self.clients.close()
+        if self.persistent:
+            return
         if self.temp_dir.exists():
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
 
+def load_batch_jobs(source: str, output_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    读取批量任务列表
+
+    source 可以是目录（其中所有 .html 文件），也可以是 JSON 清单：
+        [{"html": "a.html", "output": "a.mp4", "voice": "...", "slides_json": "a.json"}, ...]
+    或 {"decks": [...]}。清单中的相对路径以清单所在目录为基准。
+    未指定 output 时输出 <文件名>.mp4（output_dir 或 HTML 所在目录）。
+    """
+    source_path = Path(source).resolve()
+    if source_path.is_dir():
+        base = source_path
+        entries = [{'html': str(path)} for path in sorted(source_path.glob("*.html"))]
+    else:
+        base = source_path.parent
+        with open(source_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('decks', []) if isinstance(data, dict) else data
+
+    jobs = []
+    for entry in entries:
+        job = dict(entry)
+        html_path = Path(job['html'])
+        if not html_path.is_absolute():
+            html_path = base / html_path
+        job['html'] = str(html_path)
+        output = job.get('output')
+        if output:
+            output_path = Path(output)
+            if not output_path.is_absolute():
+                output_path = base / output_path
+        else:
+            output_path = Path(output_dir or html_path.parent) / f"{html_path.stem}.mp4"
+        job['output'] = str(output_path)
+        if job.get('slides_json') and not Path(job['slides_json']).is_absolute():
+            job['slides_json'] = str(base / job['slides_json'])
+        jobs.append(job)
+    return jobs
+
+
+class BatchConverter:
+    """
+    批量转换多个演示文稿
+
+    所有转换器共享：
+    - 一个 Playwright 浏览器池（提取与截图）
+    - TTS 调度器与连接池（限速、并发上限与长连接全局生效）
+    - 配音缓存目录（相同讲解文字与语音只合成一次）
+    - 一个片段编码线程池
+    全局并发预算按比例分配给截图、TTS 与编码；多个演示文稿同时进行，
+    各阶段的空闲时间由其他演示文稿填补。
+    """
+
+    # 每个任务可覆盖的转换参数
+    JOB_OPTIONS = ['voice', 'language', 'tts_provider', 'resolution', 'fps', 'subtitle', 'work_dir', 'resume',
+                   'slides_json']
+
+    def __init__(self, jobs: List[Dict[str, Any]], budget: Optional[int] = None,
+                 parallel_decks: int = 2, cache_dir: Optional[str] = None,
+                 scheduler: Optional[TTSScheduler] = None, tts_pool_size: int = 10,
+                 **converter_options):
+        self.jobs = jobs
+        self.budget = self.split_budget(budget or os.cpu_count() or 1)
+        self.parallel_decks = max(1, min(parallel_decks, len(jobs) or 1))
+        self.converter_options = converter_options
+        # 未指定缓存目录时：有持久任务（work_dir / resume）则使用持久缓存目录，
+        # 否则使用临时目录，批量任务结束后删除
+        if cache_dir is None:
+            cache_dir = self.persistent_cache_dir()
+            if cache_dir:
+                log_info(f"配音缓存目录: {cache_dir}（持久任务可跨次运行复用）")
+        self.owns_cache = cache_dir is None
+        self.cache_dir = Path(cache_dir or tempfile.mkdtemp(prefix="ppt_video_cache_"))
+        self.scheduler = scheduler or TTSScheduler(concurrency=self.budget['tts'])
+        self.clients = TTSClientPool(tts_pool_size)
+
+    def persistent_cache_dir(self) -> Optional[str]:
+        """
+        持久任务的默认配音缓存目录
+
+        共享缓存中的配音不会保存在各任务的工作目录里；若使用临时缓存，重新运行或续转时
+        每页都要重新合成。默认放在第一个持久任务的工作目录旁（--work-dir 时为 <work-dir>/.tts_cache），
+        或其输出目录下的 .tts_cache。
+        """
+        for job in self.jobs:
+            if job.get('work_dir'):
+                return str(Path(job['work_dir']).resolve().parent / ".tts_cache")
+            if job.get('resume', self.converter_options.get('resume')):
+                return str(Path(job['output']).resolve().parent / ".tts_cache")
+        return None
+
+    @staticmethod
+    def split_budget(budget: int) -> Dict[str, int]:
+        """将全局并发预算分配给截图（1/4）、编码（1/2）与 TTS（其余，至少 2）"""
+        capture = max(1, budget // 4)
+        encode = max(1, budget // 2)
+        tts = max(2, budget - capture - encode)
+        return {'capture': capture, 'encode': encode, 'tts': tts}
+
+    def _convert_one(self, index: int, job: Dict[str, Any], browsers: BrowserPool,
+                     encoder: ThreadPoolExecutor) -> Dict[str, Any]:
+        options = dict(self.converter_options)
+        options.update({key: job[key] for key in self.JOB_OPTIONS if key in job})
+        converter = PPTToVideoConverter(
+            html_path=job['html'],
+            output=job['output'],
+            jobs=self.budget['encode'],
+            tts_workers=self.budget['tts'],
+            capture_workers=self.budget['capture'],
+            scheduler=self.scheduler,
+            clients=self.clients,
+            browsers=browsers,
+            encoder=encoder,
+            cache_dir=str(self.cache_dir),
+            **options
+        )
+        started = time.monotonic()
+        log_step("批量", f"[{index+1}/{len(self.jobs)}] {job['html']}")
+        try:
+            converter.convert()
+        except Exception as e:
+            log_error(f"转换失败: {job['html']}: {e}")
+            converter.cleanup()
+            return {'html': job['html'], 'ok': False, 'seconds': time.monotonic() - started, 'video_ms': 0,
+                    'metrics': converter.metrics_report()}
+        return {
+            'html': job['html'],
+            'output': job['output'],
+            'ok': True,
+            'seconds': time.monotonic() - started,
+            'video_ms': converter.total_duration_ms,
+            'metrics': converter.metrics_report(),
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """执行全部任务，返回汇总（含吞吐：视频分钟 / 墙钟分钟）"""
+        log_info(f"批量转换 {len(self.jobs)} 个演示文稿（同时 {self.parallel_decks} 个）")
+        log_info(f"并发预算: 截图 {self.budget['capture']} / TTS {self.budget['tts']} / 编码 {self.budget['encode']}")
+
+        started = time.monotonic()
+        try:
+            with BrowserPool(self.budget['capture']) as browsers, \
+                    ThreadPoolExecutor(max_workers=self.budget['encode']) as encoder, \
+                    ThreadPoolExecutor(max_workers=self.parallel_decks) as decks:
+                results = list(decks.map(
+                    lambda item: self._convert_one(item[0], item[1], browsers, encoder),
+                    enumerate(self.jobs)
+                ))
+        finally:
+            self.clients.close()
+            if self.owns_cache:
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+        wall_seconds = time.monotonic() - started
+
+        video_minutes = sum(result['video_ms'] for result in results) / 60000
+        wall_minutes = wall_seconds / 60
+        summary = {
+            'decks': len(results),
+            'succeeded': sum(1 for result in results if result['ok']),
+            'failed': sum(1 for result in results if not result['ok']),
+            'video_minutes': video_minutes,
+            'wall_minutes': wall_minutes,
+            'throughput': video_minutes / wall_minutes if wall_minutes > 0 else 0.0,
+            'results': results,
+        }
+
+        print()
+        log_info("批量转换汇总:")
+        for result in results:
+            status = "成功" if result['ok'] else "失败"
+            print(f"  [{status}] {Path(result['html']).name}: 视频 {result['video_ms']/1000:.1f}秒，"
+                  f"耗时 {result['seconds']:.1f}秒")
+        log_success(f"完成 {summary['succeeded']}/{summary['decks']} 个，视频 {video_minutes:.1f} 分钟，"
+                    f"耗时 {wall_minutes:.1f} 分钟，吞吐 {summary['throughput']:.2f} 视频分钟/墙钟分钟")
+        return summary
+
+
 def list_voices(provider: str = "edge", language: str = "zh"):
     """列出可用的语音"""
     if provider == "edge" and language == "zh":
@@ -989,9 +3579,10 @@ def list_tts_services():
         print(f"  {Colors.CYAN}{service_id}{Colors.END} - {info['name']} [{free_tag}] 质量: {info['quality']}")
     print(f"\n{Colors.BOLD}环境变量配置:{Colors.END}")
     print("  OpenAI:      OPENAI_API_KEY")
-    print("  火山引擎:     VOLCENGINE_ACCESS_KEY, VOLCENGINE_SECRET_KEY, VOLCENGINE_APP_ID")
+    print("  火山引擎:     VOLCENGINE_ACCESS_KEY, VOLCENGINE_SECRET_KEY, VOLCENGINE_APP_ID, VOLCENGINE_TTS_URL（可选）")
     print("  智谱 AI:     ZHIPUAI_API_KEY")
     print("  Fish Speech: FISH_SPEECH_URL (默认: http://localhost:8080)")
+    print("  本地 TTS:    LOCAL_TTS_ENGINE (piper/espeak-ng/tone，默认自动), PIPER_MODEL")
 
 
 def main():
@@ -999,6 +3590,32 @@ def main():
         description="将 HTML PPT 幻灯片转换为带配音和字幕的视频（v3.3 支持国产 TTS）",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
+v3.4 改进:
+  - 分段编码：每页独立编码，--jobs 路并行，流复制拼接
+  - 增量重建：--work-dir 持久工作目录，仅重新生成变化的页面
+  - 单次合成：--compose single-pass 一次 ffmpeg 直接输出 MP4
+  - 音频时长只探测一次，静音按时长复用
+  - 流水线模式：--pipeline 截图与 TTS 并行，就绪页面立即编码
+  - 分片截图：--capture-workers 个浏览器上下文并行截图
+  - 截图等待基于渲染事件，不再使用固定延时
+  - 截图质量：--capture-quality native(默认)/supersample，--capture-format jpeg(默认)/png
+  - 截图去重：相同画面共用文件，相邻相同画面合并
+  - 编码配置：--profile fast-draft/web/archive，--video-codec libx264/libx265/libsvtav1
+  - TTS 调度：限速、并发上限，限流/超时自动重试（--tts-rate / --tts-concurrency / --tts-retries）
+  - TTS 连接复用：每个服务商一个长连接会话（--tts-pool-size）
+  - TTS 响应流式写入磁盘，内存占用有上限
+  - 批量转换：--batch 目录或清单，共享浏览器池、TTS 连接与配音缓存（--cache-dir）
+  - 断点续转：--resume 中断或失败后重新运行，跳过讲解文字提取与已完成的页面
+  - 性能统计：--metrics-out 输出各阶段/每页耗时、子进程次数、写入字节、峰值内存（JSON）
+  - 本地离线 TTS：--tts local（piper / espeak-ng / 内置提示音，LOCAL_TTS_ENGINE 指定）
+  - 按需导入 Playwright 与 TTS SDK，--list-services / --list-voices 不再加载它们
+  - HLS 输出：--format hls 每页一个 TS 分片，编码完成即发布，可边转换边播放
+  - 磁盘预算：--temp-root /dev/shm 使用内存盘，--disk-budget 2G 超出时提前清理已编码页面的截图
+  - 入场动画：--animate 逐帧截取入场动画，动画结束后保持最后一帧
+  - 截图切页只改动离开与进入的两页，大型演示文稿不再随页数平方增长
+  - 提取讲解文字不再启动浏览器；--slides-json 直接使用 generate_html.py 的源 JSON
+  - single-pass / two-pass 配音统一为 PCM WAV 后流复制拼接，不再经过 MP3 重新编码
+
 v3.3 改进:
   - 新增国产 TTS 服务：火山引擎、智谱 AI、Fish Speech
   - 支持 30+ 中文语音选择
@@ -1013,18 +3630,25 @@ v3.2 改进:
   python3 ppt_to_video.py presentation.html --tts zhipu -o output.mp4
   python3 ppt_to_video.py --list-voices --tts volcengine
   python3 ppt_to_video.py --list-services
+  python3 ppt_to_video.py --batch decks/ -o videos/ --cache-dir .tts-cache
         """
     )
 
     parser.add_argument("html", nargs="?", help="HTML PPT 文件路径")
     parser.add_argument("-o", "--output", default="output.mp4", help="输出视频路径")
+    parser.add_argument("--format", choices=PPTToVideoConverter.OUTPUT_FORMATS, default="mp4",
+                        help="输出格式: mp4(默认)/hls(m3u8 播放列表 + 每页 TS 分片，边转换边发布)")
     parser.add_argument("--resolution", default="1920x1080", help="视频分辨率")
     parser.add_argument("--fps", type=int, default=30, help="帧率")
-    parser.add_argument("--tts", choices=["edge", "openai", "volcengine", "zhipu", "fish"], default="edge",
-                        help="TTS 服务: edge(免费)/openai/volcengine(火山引擎)/zhipu(智谱)/fish")
+    parser.add_argument("--tts", choices=["edge", "openai", "volcengine", "zhipu", "fish", "local"], default="edge",
+                        help="TTS 服务: edge(免费)/openai/volcengine(火山引擎)/zhipu(智谱)/fish/local(本地离线)")
     parser.add_argument("--voice", help="指定语音")
     parser.add_argument("--language", default="zh", help="语言")
+    parser.add_argument("--slides-json", help="generate_html.py 的源 slides JSON，直接从中读取讲解文字")
     parser.add_argument("--keep-temp", action="store_true", help="保留临时文件")
+    parser.add_argument("--work-dir", help="持久工作目录（按 manifest 增量重建，仅重新生成变化的页面）")
+    parser.add_argument("--resume", action="store_true",
+                        help="断点续转：使用持久任务目录（默认 .<输出名>.job）与检查点，跳过讲解文字提取与已完成的页面")
     parser.add_argument("--list-voices", action="store_true", help="列出可用语音")
     parser.add_argument("--list-services", action="store_true", help="列出所有 TTS 服务")
     # 字幕相关参数
@@ -1032,6 +3656,40 @@ v3.2 改进:
     parser.add_argument("--subtitle-font", default="PingFang SC, Noto Sans SC, sans-serif", help="字幕字体")
     parser.add_argument("--subtitle-fontsize", type=int, default=28, help="字幕字号")
     parser.add_argument("--subtitle-radius", type=int, default=12, help="字幕背景圆角")
+    # 合成相关参数
+    parser.add_argument("--compose", choices=PPTToVideoConverter.COMPOSE_MODES, default="segments",
+                        help="合成模式: segments(分段并行编码, 默认)/single-pass(一次合成)/two-pass(整体编码后合并音频)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行编码进程数（默认: CPU 核数）")
+    parser.add_argument("--profile", choices=list(PPTToVideoConverter.ENCODING_PROFILES), default="web",
+                        help="编码配置: fast-draft(快速预览)/web(默认)/archive(归档)")
+    parser.add_argument("--video-codec", choices=PPTToVideoConverter.VIDEO_CODECS, default="libx264",
+                        help="视频编码器（CPU）")
+    parser.add_argument("--benchmark-profiles", action="store_true",
+                        help="对各编码配置与编码器做基准测试（不调用 TTS，不生成视频）")
+    parser.add_argument("--pipeline", action="store_true", help="流水线模式：截图、TTS、编码并行执行")
+    parser.add_argument("--tts-workers", type=int, default=4, help="并行生成配音的页数")
+    parser.add_argument("--tts-rate", type=float, default=None, help="TTS 每秒请求数上限（默认按服务商）")
+    parser.add_argument("--tts-concurrency", type=int, default=None, help="TTS 同时进行的请求数上限（默认按服务商）")
+    parser.add_argument("--tts-retries", type=int, default=5, help="TTS 限流/超时的最大重试次数")
+    parser.add_argument("--tts-pool-size", type=int, default=10, help="每个 TTS 服务商保持的长连接数")
+    parser.add_argument("--capture-workers", type=int, default=None, help="并行截图的浏览器数，每个占用一个 Chromium 进程（默认: CPU 核数，最多 4）")
+    parser.add_argument("--capture-quality", choices=list(PPTToVideoConverter.CAPTURE_QUALITIES), default="native",
+                        help="截图质量: native(按目标分辨率, 默认)/supersample(2 倍超采样)")
+    parser.add_argument("--capture-format", choices=PPTToVideoConverter.CAPTURE_FORMATS, default="jpeg",
+                        help="截图格式: jpeg(默认)/png(无损)")
+    parser.add_argument("--jpeg-quality", type=int, default=90, help="JPEG 截图质量 (1-100)")
+    parser.add_argument("--animate", action="store_true",
+                        help="逐帧截取翻页与元素入场动画，动画结束后以静态截图保持")
+    parser.add_argument("--temp-root", help="临时工作目录的父目录（如 /dev/shm 内存盘）")
+    parser.add_argument("--disk-budget", type=parse_size, default=None,
+                        help="工作目录磁盘预算（如 500M、2G），超出时提前删除已编码页面的截图")
+    parser.add_argument("--metrics-out", help="将性能统计（阶段/每页耗时、子进程、写入字节、峰值内存）写入 JSON 文件")
+    # 批量转换参数
+    parser.add_argument("--batch", help="批量转换：HTML 所在目录或 JSON 清单（此时 -o 为输出目录）")
+    parser.add_argument("--batch-decks", type=int, default=2, help="批量模式同时转换的演示文稿数")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="批量模式全局并发预算，按比例分配给截图/TTS/编码（默认: CPU 核数）")
+    parser.add_argument("--cache-dir", help="配音缓存目录（相同讲解文字与语音只合成一次，可跨次运行复用）")
 
     args = parser.parse_args()
 
@@ -1043,6 +3701,10 @@ v3.2 改进:
         list_voices(args.tts, args.language)
         return
 
+    if args.batch:
+        run_batch(args, parser.get_default("output"))
+        return
+
     if not args.html:
         parser.error("请提供 HTML 文件路径")
 
@@ -1062,18 +3724,122 @@ v3.2 改进:
         subtitle=not args.no_subtitle,
         subtitle_font=args.subtitle_font,
         subtitle_fontsize=args.subtitle_fontsize,
-        subtitle_bg_radius=args.subtitle_radius
+        subtitle_bg_radius=args.subtitle_radius,
+        compose_mode=args.compose,
+        jobs=args.jobs,
+        work_dir=args.work_dir,
+        pipeline=args.pipeline,
+        tts_workers=args.tts_workers,
+        capture_workers=args.capture_workers,
+        capture_quality=args.capture_quality,
+        capture_format=args.capture_format,
+        jpeg_quality=args.jpeg_quality,
+        encoding_profile=args.profile,
+        video_codec=args.video_codec,
+        scheduler=TTSScheduler(
+            rate=args.tts_rate,
+            concurrency=args.tts_concurrency,
+            max_retries=args.tts_retries
+        ),
+        tts_pool_size=args.tts_pool_size,
+        cache_dir=args.cache_dir,
+        resume=args.resume,
+        output_format=args.format,
+        temp_root=args.temp_root,
+        disk_budget=args.disk_budget,
+        animate=args.animate,
+        slides_json=args.slides_json
     )
 
     try:
+        if args.benchmark_profiles:
+            converter.benchmark_profiles()
+            converter.cleanup()
+            return
         converter.convert()
+        if args.metrics_out:
+            converter.write_metrics(args.metrics_out)
     except KeyboardInterrupt:
         log_warning("用户中断")
         converter.cleanup()
+        if converter.resume:
+            log_info(f"进度已保存，使用 --resume 重新运行即可继续: {converter.temp_dir}")
         sys.exit(1)
     except Exception as e:
         log_error(f"转换失败: {e}")
+        if args.metrics_out:
+            converter.write_metrics(args.metrics_out)
         converter.cleanup()
+        if converter.resume:
+            log_info(f"进度已保存，使用 --resume 重新运行即可继续: {converter.temp_dir}")
+        sys.exit(1)
+
+
+def run_batch(args, default_output: str):
+    """--batch: 批量转换目录或清单中的全部演示文稿"""
+    if not Path(args.batch).exists():
+        log_error(f"批量任务不存在: {args.batch}")
+        sys.exit(1)
+
+    output_dir = None if args.output == default_output else args.output
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    jobs = load_batch_jobs(args.batch, output_dir)
+    if not jobs:
+        log_error(f"未找到 HTML 文件: {args.batch}")
+        sys.exit(1)
+
+    if args.work_dir:
+        # 每个演示文稿一个持久子目录
+        for job in jobs:
+            job.setdefault('work_dir', str(Path(args.work_dir) / Path(job['html']).stem))
+
+    budget = BatchConverter.split_budget(args.budget or os.cpu_count() or 1)
+    batch = BatchConverter(
+        jobs,
+        budget=args.budget,
+        parallel_decks=args.batch_decks,
+        cache_dir=args.cache_dir,
+        scheduler=TTSScheduler(
+            rate=args.tts_rate,
+            concurrency=args.tts_concurrency or budget['tts'],
+            max_retries=args.tts_retries
+        ),
+        tts_pool_size=args.tts_pool_size,
+        resolution=args.resolution,
+        fps=args.fps,
+        tts_provider=args.tts,
+        voice=args.voice,
+        language=args.language,
+        keep_temp=args.keep_temp,
+        subtitle=not args.no_subtitle,
+        subtitle_font=args.subtitle_font,
+        subtitle_fontsize=args.subtitle_fontsize,
+        subtitle_bg_radius=args.subtitle_radius,
+        compose_mode=args.compose,
+        pipeline=args.pipeline,
+        capture_quality=args.capture_quality,
+        capture_format=args.capture_format,
+        jpeg_quality=args.jpeg_quality,
+        encoding_profile=args.profile,
+        video_codec=args.video_codec,
+        resume=args.resume,
+        output_format=args.format,
+        temp_root=args.temp_root,
+        disk_budget=args.disk_budget,
+        animate=args.animate
+    )
+    try:
+        summary = batch.run()
+    except KeyboardInterrupt:
+        log_warning("用户中断")
+        sys.exit(1)
+    if args.metrics_out:
+        summary['peak_rss_bytes'] = PipelineMetrics.peak_rss_bytes()
+        with open(args.metrics_out, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        log_info(f"统计报告已写入: {args.metrics_out}")
+    if summary['failed']:
         sys.exit(1)
 
 